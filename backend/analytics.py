@@ -0,0 +1,282 @@
+from flask import Blueprint, g, jsonify, request
+
+from archive import archived_years, load_archived_transactions
+from auth import login_required
+from models import db, ArchivedSummary, Insight, Transaction, get_home_currency
+from money import from_minor, minor_exponent
+from replicas import replica_read
+
+bp = Blueprint('analytics', __name__)
+
+
+@bp.route('/api/analytics', methods=['GET'])
+@login_required
+@replica_read
+def get_analytics():
+    user_id = g.user_id
+    period = request.args.get('period', 'monthly')
+    categories = request.args.get('categories', '')
+    category = request.args.get('category', '')
+
+    if period == 'monthly':
+        date_format = '%Y-%m'
+    elif period == 'yearly':
+        date_format = '%Y'
+
+    query = Transaction.query.filter_by(user_id=user_id)
+    archived_query = ArchivedSummary.query.filter_by(user_id=user_id)
+
+    if period == 'monthly' and categories and categories.lower() != 'all':
+        category_list = categories.split(',')
+        query = query.filter(Transaction.category.in_(category_list))
+        archived_query = archived_query.filter(ArchivedSummary.category.in_(category_list))
+    elif period == 'yearly' and category and category.lower() != 'all':
+        query = query.filter(Transaction.category == category)
+        archived_query = archived_query.filter(ArchivedSummary.category == category)
+
+    transactions = query.all()
+    scale = 10 ** minor_exponent(get_home_currency(user_id))
+
+    summary = {}
+    category_breakdown = {}
+    details = {}
+
+    for tx in transactions:
+        period_key = tx.date.strftime(date_format)
+
+        # Summary
+        if period_key not in summary:
+            summary[period_key] = {'income': 0, 'expense': 0}
+        summary[period_key][tx.type] += tx.amount_base
+
+        # Category breakdown
+        if period_key not in category_breakdown:
+            category_breakdown[period_key] = {'income': {}, 'expense': {}}
+        if tx.category not in category_breakdown[period_key][tx.type]:
+            category_breakdown[period_key][tx.type][tx.category] = 0
+        category_breakdown[period_key][tx.type][tx.category] += tx.amount_base
+
+        # Details
+        if period_key not in details:
+            details[period_key] = []
+        details[period_key].append({
+            'id': tx.id,
+            'type': tx.type,
+            'category': tx.category,
+            'amount': tx.amount,
+            'amount_base': tx.amount_base / scale,
+            'currency': tx.currency or 'ILS',
+            'exchange_rate': tx.exchange_rate or 1.0,
+            'description': tx.description,
+            'date': tx.date.strftime('%Y-%m-%d')
+        })
+
+    # Archived years only contribute totals; their rows come from /api/archive/<year>
+    for row in archived_query.all():
+        period_key = f'{row.year:04d}-{row.month:02d}' if period == 'monthly' else f'{row.year:04d}'
+        summary.setdefault(period_key, {'income': 0, 'expense': 0})[row.type] += row.total_base
+        by_category = category_breakdown.setdefault(period_key, {'income': {}, 'expense': {}})[row.type]
+        by_category[row.category] = by_category.get(row.category, 0) + row.total_base
+
+    # Totals were summed exactly in minor units; convert once for the response
+    for totals in summary.values():
+        for type_ in totals:
+            totals[type_] /= scale
+    for breakdown in category_breakdown.values():
+        for by_category in breakdown.values():
+            for name in by_category:
+                by_category[name] /= scale
+
+    return jsonify({
+        'summary': summary,
+        'categoryBreakdown': category_breakdown,
+        'details': details,
+        'archivedYears': archived_years(user_id)
+    })
+
+
+def _month_label(month_idx):
+    return f"{month_idx // 12:04d}-{month_idx % 12 + 1:02d}"
+
+
+def _monthly_trends(user_id, category_list=None):
+    # Monthly per-category totals in minor units of the home currency
+    month_idx = (
+        db.extract('year', Transaction.date) * 12
+        + db.extract('month', Transaction.date) - 1
+    )
+    hot = (
+        db.select(
+            Transaction.type.label('type'),
+            Transaction.category.label('category'),
+            month_idx.label('month_idx'),
+            Transaction.amount_base.label('total'),
+        )
+        .where(Transaction.user_id == user_id)
+    )
+    # Archived years are already summarised per month and category
+    cold = (
+        db.select(
+            ArchivedSummary.type.label('type'),
+            ArchivedSummary.category.label('category'),
+            (ArchivedSummary.year * 12 + ArchivedSummary.month - 1).label('month_idx'),
+            ArchivedSummary.total_base.label('total'),
+        )
+        .where(ArchivedSummary.user_id == user_id)
+    )
+    if category_list:
+        hot = hot.where(Transaction.category.in_(category_list))
+        cold = cold.where(ArchivedSummary.category.in_(category_list))
+    rows = db.union_all(hot, cold).subquery('rows')
+    monthly = (
+        db.select(
+            rows.c.type,
+            rows.c.category,
+            rows.c.month_idx,
+            db.func.sum(rows.c.total).label('total'),
+        )
+        .group_by(rows.c.type, rows.c.category, rows.c.month_idx)
+        .cte('monthly')
+    )
+
+    # Dense calendar between the first and last month with data, so that
+    # ROWS frames and LAG(12) always mean "months" and not "rows with data"
+    bounds = db.select(
+        db.func.min(monthly.c.month_idx).label('lo'),
+        db.func.max(monthly.c.month_idx).label('hi'),
+    ).cte('bounds')
+    months = db.select(bounds.c.lo.label('month_idx')).where(bounds.c.lo.isnot(None)).cte('months', recursive=True)
+    months = months.union_all(
+        db.select((months.c.month_idx + 1).label('month_idx'))
+        .where(months.c.month_idx < db.select(bounds.c.hi).scalar_subquery())
+    )
+    series = db.select(monthly.c.type, monthly.c.category).distinct().cte('series')
+
+    dense = (
+        db.select(
+            series.c.type,
+            series.c.category,
+            months.c.month_idx,
+            db.func.coalesce(monthly.c.total, 0).label('total'),
+        )
+        .select_from(series.join(months, db.true()))
+        .outerjoin(monthly, db.and_(
+            monthly.c.type == series.c.type,
+            monthly.c.category == series.c.category,
+            monthly.c.month_idx == months.c.month_idx,
+        ))
+        .cte('dense')
+    )
+
+    window = {'partition_by': (dense.c.type, dense.c.category), 'order_by': dense.c.month_idx}
+    category_rows = db.session.execute(
+        db.select(
+            dense.c.type,
+            dense.c.category,
+            dense.c.month_idx,
+            dense.c.total,
+            db.func.avg(dense.c.total).over(rows=(-2, 0), **window).label('avg_3m'),
+            db.func.avg(dense.c.total).over(rows=(-11, 0), **window).label('avg_12m'),
+            db.func.lag(dense.c.total, 12).over(**window).label('last_year'),
+        ).order_by(dense.c.type, dense.c.category, dense.c.month_idx)
+    ).all()
+
+    signed = db.case((dense.c.type == 'income', dense.c.total), else_=-dense.c.total)
+    net = db.func.sum(signed)
+    balance_rows = db.session.execute(
+        db.select(
+            dense.c.month_idx,
+            net.label('net'),
+            db.func.sum(net).over(order_by=dense.c.month_idx).label('balance'),
+        )
+        .group_by(dense.c.month_idx)
+        .order_by(dense.c.month_idx)
+    ).all()
+
+    return category_rows, balance_rows
+
+
+@bp.route('/api/analytics/trends', methods=['GET'])
+@login_required
+@replica_read
+def get_analytics_trends():
+    categories = request.args.get('categories', '')
+    category_list = None
+    if categories and categories.lower() != 'all':
+        category_list = categories.split(',')
+
+    category_rows, balance_rows = _monthly_trends(g.user_id, category_list)
+    scale = 10 ** minor_exponent(get_home_currency(g.user_id))
+
+    trends = {'income': {}, 'expense': {}}
+    for row in category_rows:
+        month = int(row.month_idx)
+        trends.setdefault(row.type, {}).setdefault(row.category, []).append({
+            'month': _month_label(month),
+            'total': float(row.total) / scale,
+            'avg3': float(row.avg_3m) / scale,
+            'avg12': float(row.avg_12m) / scale,
+            'yoy': None if row.last_year is None else float(row.total - row.last_year) / scale,
+        })
+
+    return jsonify({
+        'runningBalance': [{
+            'month': _month_label(int(row.month_idx)),
+            'net': float(row.net) / scale,
+            'balance': float(row.balance) / scale,
+        } for row in balance_rows],
+        'categoryTrends': trends,
+    })
+
+
+
+@bp.route('/api/insights', methods=['GET'])
+@login_required
+@replica_read
+def get_insights():
+    # Precomputed by the offline insights job (insights.py)
+    scale = 10 ** minor_exponent(get_home_currency(g.user_id))
+    insights = Insight.query.filter_by(user_id=g.user_id).order_by(Insight.kind, Insight.id).all()
+    return jsonify([{
+        'kind': i.kind,
+        'month': i.month,
+        'type': i.type,
+        'category': i.category,
+        'value': i.value / scale,
+        'baseline': i.baseline / scale,
+        'score': i.score,
+        'computed_at': i.computed_at.strftime('%Y-%m-%d %H:%M:%S')
+    } for i in insights])
+
+
+@bp.route("/years", methods=["GET"])
+@replica_read
+def get_years_with_data():
+    years = (
+        db.session.query(db.extract('year', Transaction.date).label('year'))
+        .group_by('year')
+        .order_by('year')
+        .all()
+    )
+    archived = db.session.query(ArchivedSummary.year).distinct().all()
+    # format: [(2023,), (2024,), ...] → just extract the int
+    return {"years": sorted({int(y[0]) for y in years} | {int(y[0]) for y in archived})}
+
+
+@bp.route('/api/archive/<int:year>', methods=['GET'])
+@login_required
+@replica_read
+def get_archived_transactions(year):
+    scale = 10 ** minor_exponent(get_home_currency(g.user_id))
+    return jsonify([{
+        'id': r['id'],
+        'type': r['type'],
+        'category': r['category'],
+        'amount': from_minor(r['amount_minor'], r['currency']),
+        'amount_base': r['amount_base'] / scale,
+        'currency': r['currency'] or 'ILS',
+        'exchange_rate': r['exchange_rate'] or 1.0,
+        'description': r['description'],
+        'date': r['date'],
+        'archived': True
+    } for r in load_archived_transactions(g.user_id, year)])
@@ -0,0 +1,183 @@
+"""Cold-year archiving of transactions.
+
+Closed years are moved out of the hot ``transaction`` table: each
+(user, year) becomes one ArchivedYear row holding the raw transactions as
+zlib-compressed JSON, plus ArchivedSummary rows with per-month/category
+totals. Analytics read the summaries in place of the raw rows, and
+/api/archive/<year> decompresses the raw rows on demand.
+
+Archiving is a change like any other for /api/sync: moved rows get
+tombstones at a new change version, so clients drop them and read closed
+years from /api/archive/<year> instead. Editing or deleting an archived
+transaction first restores it to the hot table (restore_archived), with a
+new version; the next archive run moves it back.
+
+    cd backend && python archive.py --before 2024
+"""
+import argparse
+import datetime
+import json
+import logging
+import zlib
+
+from models import db, ArchivedSummary, ArchivedYear, Tombstone, Transaction, bump_change_version
+
+ARCHIVED_FIELDS = (
+    'id', 'type', 'category', 'amount_minor', 'amount_base', 'currency',
+    'exchange_rate', 'description', 'date', 'version',
+)
+
+
+def _year_bounds(year):
+    return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+
+
+def archive_user_year(user_id, year):
+    """Move one user's transactions for `year` into the archive. Returns rows moved."""
+    start, end = _year_bounds(year)
+    in_year = db.and_(
+        Transaction.user_id == user_id,
+        Transaction.date >= start,
+        Transaction.date < end,
+    )
+    rows = db.session.execute(
+        db.select(*(getattr(Transaction, f) for f in ARCHIVED_FIELDS))
+        .where(in_year)
+        .order_by(Transaction.date, Transaction.id)
+    ).all()
+    if not rows:
+        return 0
+
+    records = [dict(row._mapping, date=row.date.isoformat()) for row in rows]
+    if db.session.get(ArchivedYear, (user_id, year)) is not None:
+        # A year can be archived again after late entries; merge them in
+        records = load_archived_transactions(user_id, year) + records
+    _store_year(user_id, year, records)
+
+    version = bump_change_version(user_id)
+    now = datetime.datetime.utcnow()
+    db.session.execute(db.insert(Tombstone), [{
+        'user_id': user_id,
+        'entity': 'transaction',
+        'entity_id': row.id,
+        'version': version,
+        'deleted_at': now
+    } for row in rows])
+    db.session.execute(db.delete(Transaction).where(in_year).execution_options(synchronize_session=False))
+    db.session.commit()
+    return len(rows)
+
+
+def _store_year(user_id, year, records):
+    """Write the payload and monthly summaries for one archived year."""
+    db.session.execute(db.delete(ArchivedSummary).where(
+        ArchivedSummary.user_id == user_id, ArchivedSummary.year == year
+    ))
+    existing = db.session.get(ArchivedYear, (user_id, year))
+    if not records:
+        if existing is not None:
+            db.session.delete(existing)
+        return
+
+    payload = zlib.compress(json.dumps(records).encode(), 9)
+    if existing is not None:
+        existing.payload = payload
+        existing.row_count = len(records)
+        existing.archived_at = datetime.datetime.utcnow()
+    else:
+        db.session.add(ArchivedYear(user_id=user_id, year=year, row_count=len(records), payload=payload))
+
+    totals = {}
+    for r in records:
+        key = (int(r['date'][5:7]), r['type'], r['category'])
+        total, count = totals.get(key, (0, 0))
+        totals[key] = (total + r['amount_base'], count + 1)
+    db.session.execute(db.insert(ArchivedSummary), [{
+        'user_id': user_id,
+        'year': year,
+        'month': month,
+        'type': type_,
+        'category': category,
+        'total_base': total,
+        'tx_count': count,
+    } for (month, type_, category), (total, count) in totals.items()])
+
+
+def restore_archived(user_id, ids):
+    """Move archived transactions back into the hot table so they can be
+    edited or deleted. Returns the ids found; the caller commits.
+    """
+    wanted = set(ids)
+    restored = []
+    for year in archived_years(user_id):
+        if not wanted:
+            break
+        records = load_archived_transactions(user_id, year)
+        found = [r for r in records if r['id'] in wanted]
+        if not found:
+            continue
+        _store_year(user_id, year, [r for r in records if r['id'] not in wanted])
+        restored.extend(found)
+        wanted.difference_update(r['id'] for r in found)
+    if not restored:
+        return []
+
+    # A new version, and no archive tombstone, so sync clients pick them up again
+    version = bump_change_version(user_id)
+    restored_ids = [r['id'] for r in restored]
+    db.session.execute(db.delete(Tombstone).where(
+        Tombstone.user_id == user_id,
+        Tombstone.entity == 'transaction',
+        Tombstone.entity_id.in_(restored_ids)
+    ))
+    now = datetime.datetime.utcnow()
+    db.session.execute(db.insert(Transaction), [dict(
+        r,
+        user_id=user_id,
+        date=datetime.date.fromisoformat(r['date']),
+        version=version,
+        updated_at=now
+    ) for r in restored])
+    return restored_ids
+
+
+def load_archived_transactions(user_id, year):
+    archived = db.session.get(ArchivedYear, (user_id, year))
+    if archived is None:
+        return []
+    return json.loads(zlib.decompress(archived.payload))
+
+
+def archived_years(user_id):
+    return [y for (y,) in db.session.execute(
+        db.select(ArchivedYear.year).where(ArchivedYear.user_id == user_id).order_by(ArchivedYear.year)
+    )]
+
+
+def archive_closed_years(before_year):
+    """Archive every user's transactions dated before `before_year`."""
+    year_col = db.extract('year', Transaction.date)
+    pairs = db.session.execute(
+        db.select(Transaction.user_id, year_col)
+        .where(Transaction.date < datetime.date(before_year, 1, 1))
+        .group_by(Transaction.user_id, year_col)
+        .order_by(Transaction.user_id, year_col)
+    ).all()
+    moved = 0
+    for user_id, year in pairs:
+        moved += archive_user_year(user_id, int(year))
+        logging.info('Archived user %s year %s', user_id, int(year))
+    return moved
+
+
+if __name__ == '__main__':
+    from App import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # Required: a default of "this year" would archive last December on 1 January
+    parser.add_argument('--before', type=int, required=True,
+                        help='archive years strictly before this one')
+    args = parser.parse_args()
+    with create_app({'AUTO_CREATE_SCHEMA': False}).app_context():
+        db.create_all()
+        print(f'Archived {archive_closed_years(args.before)} transactions')
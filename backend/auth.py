@@ -0,0 +1,294 @@
+import datetime
+import logging
+import os
+from functools import wraps
+
+from flask import Blueprint, current_app, g, jsonify, request
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User
+from rate_limit import rate_limit
+from username_index import username_index
+
+bp = Blueprint('auth', __name__)
+
+
+def send_reset_email(to_email, reset_link):
+    import resend
+    resend.api_key = os.getenv("RESEND_API_KEY")
+    try:
+        params = {
+            "from": "MoneyTracker <onboarding@resend.dev>",
+            "to": [to_email],
+            "subject": "Reset your password",
+            "html": f"""<p>You requested a password reset.</p>
+                    <p>Click the link below to reset your password:</p>
+                    <p><a href="{reset_link}">Reset Password</a></p>
+                    <p>If you did not request this, ignore this email.</p>"""
+        }
+
+        email = resend.Emails.send(params)
+        logging.info("Email sent: %s", email)
+        return True
+    except Exception as e:
+        logging.error("Resend error: %s", e)
+        return False
+
+def generate_access_token(user_id):
+    import jwt
+    payload = {
+        'user_id': user_id,
+        'type': 'access',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=15)
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def generate_refresh_token(user_id):
+    import jwt
+    payload = {
+        'user_id': user_id,
+        'type': 'refresh',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=14)
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def decode_token(token, expected_type):
+    import jwt
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        if payload.get('type') != expected_type:
+            return None
+        return payload['user_id']
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        return None
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.cookies.get('access_token')
+        if not token:
+            return jsonify({'message': 'Unauthorized'}), 401
+
+        user_id = decode_token(token, 'access')
+        if not user_id:
+            return jsonify({'message': 'Access token expired'}), 401
+
+        g.user_id = user_id
+        return f(*args, **kwargs)
+    return decorated
+
+
+
+@bp.route('/api/signup', methods=['POST'])
+def signup():
+    data = request.get_json(silent=True)
+
+    username = data.get('username')
+    password = data.get('password')
+    email = data.get('email')
+
+    if not username or not password or not email:
+        return jsonify({'message': 'Username, email and password required'}), 400
+
+    if username_index.is_taken(username):
+        return jsonify({'message': 'Username already exists'}), 400
+
+    user = User(username=username, email=email)
+    user.set_password(password)
+
+    db.session.add(user)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Lost a race, or the name was taken through another worker
+        db.session.rollback()
+        taken = db.session.execute(
+            db.select(User.id).where(db.func.lower(User.username) == username.lower())
+        ).first() is not None
+        if taken:
+            username_index.add(username)
+            return jsonify({'message': 'Username already exists'}), 400
+        return jsonify({'message': 'Email already registered'}), 400
+
+    username_index.add(username)
+    return jsonify({'message': 'User created'}), 201
+
+
+@bp.route('/api/login', methods=['POST'])
+@rate_limit('login', capacity=10, per_seconds=60)
+def login():
+    data = request.get_json(silent=True)
+
+    if not data:
+        return jsonify({'message': 'Invalid JSON body'}), 400
+
+    username = data.get('username')
+    password = data.get('password')
+
+    user = User.query.filter_by(username=username).first()
+
+    if not user or not user.check_password(password):
+        return jsonify({'message': 'Invalid credentials'}), 401
+
+    access_token = generate_access_token(user.id)
+    refresh_token = generate_refresh_token(user.id)
+
+    resp = jsonify({'message': 'Login successful'})
+
+    resp.set_cookie(
+        'access_token',
+        access_token,
+        httponly=True,
+        secure=True,
+        samesite='None',
+        max_age=15 * 60,
+        path='/'
+    )
+
+    resp.set_cookie(
+        'refresh_token',
+        refresh_token,
+        httponly=True,
+        secure=True,
+        samesite='None',
+        max_age=14 * 24 * 60 * 60,
+        path='/'
+    )
+
+    return resp, 200
+
+
+@bp.route('/api/logout', methods=['POST'])
+def logout():
+    resp = jsonify({'message': 'Logged out'})
+    resp.delete_cookie('access_token')
+    resp.delete_cookie('refresh_token')
+    return resp
+
+
+@bp.route('/api/request_password_reset', methods=['POST'])
+@rate_limit('request_password_reset', capacity=5, per_seconds=15 * 60)
+def request_password_reset():
+    import jwt
+    data = request.get_json()
+    username = data.get("username")
+
+    if not username:
+        return jsonify({"message": "Username required"}), 400
+
+    user = User.query.filter_by(username=username).first()
+
+    if not user:
+        # Tell frontend "user does not exist"
+        return jsonify({"message": "User not found"}), 404
+
+    # User exists → create token
+    token = jwt.encode(
+        {"user_id": user.id, "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=15)},
+        current_app.config["SECRET_KEY"],
+        algorithm="HS256"
+    )
+
+    FRONTEND_URL = os.getenv("FRONTEND_URL")
+    reset_link = f"{FRONTEND_URL}/reset-password?token={token}"
+
+    send_reset_email(user.email, reset_link)
+
+    return jsonify({"message": "Email sent"}), 200
+
+
+@bp.route('/api/reset_password', methods=['POST'])
+def reset_password():
+    import jwt
+    data = request.get_json()
+    token = data.get("token")
+    new_password = data.get("password")
+
+    if not token or not new_password:
+        return jsonify({"message": "Missing token or password"}), 400
+
+    try:
+        payload = jwt.decode(
+            token,
+            current_app.config['SECRET_KEY'],
+            algorithms=['HS256']
+        )
+        user_id = payload["user_id"]
+
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token expired"}), 400
+    except Exception:
+        return jsonify({"message": "Invalid token"}), 400
+
+    user = User.query.get(user_id)
+    user.set_password(new_password)
+    db.session.commit()
+
+    return jsonify({"message": "Password changed"}), 200
+
+
+@bp.route('/api/refresh', methods=['POST'])
+def refresh():
+    import jwt
+    token = request.cookies.get('refresh_token')
+
+    if not token:
+        return jsonify({'message': 'No refresh token'}), 401
+
+    try:
+        payload = jwt.decode(
+            token,
+            current_app.config['SECRET_KEY'],
+            algorithms=['HS256']
+        )
+        if payload.get('type') != 'refresh':
+            return jsonify({'message': 'Invalid token type'}), 401
+
+        user_id = payload['user_id']
+
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Refresh token expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Invalid refresh token'}), 401
+
+    new_access = generate_access_token(user_id)
+
+    resp = jsonify({'message': 'refreshed'})
+    resp.set_cookie(
+        'access_token',
+        new_access,
+        httponly=True,
+        secure=True,
+        samesite='None',
+        path='/',
+        max_age=15 * 60
+    )
+    return resp
+
+@bp.route('/api/check_username', methods=['GET'])
+@rate_limit('check_username', capacity=30, per_seconds=10)
+def check_username():
+    username = request.args.get('username', '').strip()
+
+    if not username:
+        return jsonify({'available': False, 'message': 'Missing username'}), 400
+
+    return jsonify({'available': not username_index.is_taken(username)})
+
+@bp.route('/api/me', methods=['GET'])
+@login_required
+def me():
+    user = User.query.get(g.user_id)
+
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    return jsonify({
+        'id': user.id,
+        'username': user.username
+    })
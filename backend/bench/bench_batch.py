@@ -0,0 +1,150 @@
+"""N individual PUT/DELETE calls vs. one POST /api/transactions/batch.
+
+Starts gunicorn with the production config (gevent, one worker) on a
+temporary SQLite database and, for each --ops size, edits half of a user's
+transactions and deletes the other half: once with one request per
+transaction over a keep-alive connection, once with a single batch request.
+Reports round trips and wall time. --rtt-ms adds that much client-side
+delay per request, to model the network between browser and server.
+
+    cd backend && python bench/bench_batch.py --ops 10 100 500
+    cd backend && python bench/bench_batch.py --rtt-ms 40
+    cd backend && python bench/bench_batch.py --url postgresql://localhost/bench
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+SECRET_KEY = 'bench-secret-key-that-is-long-enough'
+
+
+def seed(url, count):
+    """A fresh database with one user and `count` transactions; returns (token, ids)."""
+    os.environ['SECRET_KEY'] = SECRET_KEY
+    from App import create_app
+    from auth import generate_access_token
+    from models import db, Transaction, User
+    with create_app({'SQLALCHEMY_DATABASE_URI': url, 'AUTO_CREATE_SCHEMA': False}).app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        ids = []
+        for i in range(count):
+            tx = Transaction(type='expense', category='Food', date=datetime.date(2024, 1, 1) + datetime.timedelta(i),
+                             user_id=user.id, currency='ILS')
+            tx.set_amount(10 + i, 1.0, 'ILS')
+            db.session.add(tx)
+            db.session.flush()
+            ids.append(tx.id)
+        db.session.commit()
+        token = generate_access_token(user.id)
+        db.engine.dispose()
+    return token, ids
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(url, port):
+    env = dict(os.environ, DATABASE_URL=url, SECRET_KEY=SECRET_KEY, AUTO_CREATE_SCHEMA='0', LOG_LEVEL='WARNING')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'App:create_app()',
+         '--bind', f'127.0.0.1:{port}', '--workers', '1'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit('server did not start')
+
+
+class Client:
+    def __init__(self, port, token, rtt):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.headers = {'Content-Type': 'application/json', 'Cookie': f'access_token={token}'}
+        self.rtt = rtt
+        self.round_trips = 0
+        self.latencies = []
+
+    def call(self, method, path, body=None):
+        started = time.perf_counter()
+        time.sleep(self.rtt)
+        self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=self.headers)
+        response = self.conn.getresponse()
+        response.read()
+        self.round_trips += 1
+        self.latencies.append(time.perf_counter() - started)
+        assert response.status == 200, (method, path, response.status)
+
+
+def individual(client, ids):
+    half = len(ids) // 2
+    for tx_id in ids[:half]:
+        client.call('PUT', f'/api/transactions/{tx_id}', {
+            'type': 'expense', 'category': 'Food', 'amount': 99.5, 'date': '2024-06-01'
+        })
+    for tx_id in ids[half:]:
+        client.call('DELETE', f'/api/transactions/{tx_id}')
+
+
+def batch(client, ids):
+    half = len(ids) // 2
+    client.call('POST', '/api/transactions/batch', {'operations': (
+        [{'op': 'update', 'id': tx_id, 'amount': 99.5, 'date': '2024-06-01'} for tx_id in ids[:half]]
+        + [{'op': 'delete', 'id': tx_id} for tx_id in ids[half:]]
+    )})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, nargs='+', default=[10, 100, 500],
+                        help='transactions changed per run (at most 500, the batch limit)')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='simulated network round trip per request')
+    parser.add_argument('--url', help='database URL, emptied first (default: temporary SQLite files)')
+    args = parser.parse_args()
+
+    for ops in args.ops:
+        for mode, run in (('individual', individual), ('batch', batch)):
+            url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'batch.db')
+            token, ids = seed(url, ops)
+            port = free_port()
+            process = start_server(url, port)
+            try:
+                # Warm-up: the first request opens the worker's DB connection
+                Client(port, token, 0).call('GET', '/api/sync?since=0')
+                client = Client(port, token, args.rtt_ms / 1000)
+                started = time.perf_counter()
+                run(client, ids)
+                elapsed = time.perf_counter() - started
+            finally:
+                process.terminate()
+                process.wait(15)
+            print(f'{ops:>4} ops  {mode:<10} {client.round_trips:>4} round trips  '
+                  f'{elapsed * 1000:8.1f} ms total  '
+                  f'(median request {statistics.median(client.latencies) * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
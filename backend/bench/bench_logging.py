@@ -0,0 +1,120 @@
+"""Request throughput under the old and the new logging setup.
+
+Each mode runs in its own interpreter, with stdout read by the parent
+as a log collector would:
+
+* ``basic`` - the previous setup: logging.basicConfig(stream=sys.stdout,
+  level=logging.DEBUG), every record formatted and written on the request
+  thread, library DEBUG/INFO chatter (SQL statements) included
+* ``queue`` - configure_logging(): JSON records written by the
+  QueueListener thread, per-logger levels, 10% of successful access logs
+* ``queue-all`` - as ``queue`` but keeping every access log
+
+    cd backend && python bench/bench_logging.py --requests 4000 --threads 8
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('basic', 'queue', 'queue-all')
+
+
+def child(mode, requests, threads):
+    sys.path.insert(0, BACKEND)
+    from App import create_app
+    from auth import generate_access_token
+    from logging_config import access_logger
+    from models import db, Transaction, User
+    import datetime
+
+    app = create_app({'AUTO_CREATE_SCHEMA': False, 'RATE_LIMIT_ENABLED': False})
+    if mode == 'basic':
+        access_logger.filters.clear()
+        for name in ('sqlalchemy', 'urllib3', 'werkzeug', 'httpx'):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        logging.basicConfig(stream=sys.stdout, level=logging.DEBUG, force=True)
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        for i in range(20):
+            tx = Transaction(type='expense', category='Food', date=datetime.date(2024, 1, i + 1),
+                             user_id=user.id, currency='ILS')
+            tx.set_amount(10 + i, 1.0, 'ILS')
+            db.session.add(tx)
+        db.session.commit()
+        token = generate_access_token(user.id)
+        # Connections decide when opened whether to log SQL; reopen them
+        db.engine.dispose()
+
+    failures = []
+
+    def worker(count):
+        client = app.test_client()
+        client.set_cookie('access_token', token)
+        for _ in range(count):
+            response = client.get('/api/analytics?period=monthly')
+            if response.status_code != 200:
+                failures.append(response.get_data(as_text=True))
+                return
+
+    per_thread = requests // threads
+    pool = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    if failures:
+        raise SystemExit(f'request failed: {failures[0]}')
+    logging.shutdown()
+    sys.stdout.flush()
+    sys.stderr.write(json.dumps({'requests': per_thread * threads, 'seconds': elapsed}) + '\n')
+
+
+def run(mode, requests, threads):
+    env = dict(os.environ, LOG_LEVEL='DEBUG' if mode == 'basic' else 'INFO',
+               LOG_SUCCESS_SAMPLE_RATE='1' if mode == 'queue-all' else '0.1',
+               DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    process = subprocess.Popen(
+        [sys.executable, __file__, '--child', mode, '--requests', str(requests), '--threads', str(threads)],
+        cwd=BACKEND, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    log_bytes = 0
+    for chunk in iter(lambda: process.stdout.read(65536), b''):
+        log_bytes += len(chunk)
+    errors = process.stderr.read().decode()
+    if process.wait() != 0:
+        raise SystemExit(f'{mode} run failed:\n{errors}')
+    stats = json.loads(errors.strip().splitlines()[-1])
+    return stats['requests'] / stats['seconds'], log_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.requests, args.threads)
+        return
+
+    results = {mode: run(mode, args.requests, args.threads) for mode in MODES}
+    for mode, (rps, log_bytes) in results.items():
+        print(f'{mode:<10} {rps:8.0f} req/s  {log_bytes / args.requests:8.0f} log bytes/request '
+              f'({rps / results["basic"][0]:.2f}x basic)')
+
+
+if __name__ == '__main__':
+    main()
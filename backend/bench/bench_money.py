@@ -0,0 +1,110 @@
+"""Float vs. integer minor-unit amounts: aggregation speed and correctness.
+
+Loads the same random transactions into the old schema (float amount and
+exchange_rate, converted per row at read time) and the new one (BIGINT
+amount_base computed on write), then times the analytics-style monthly
+SUM on each. Correctness is checked on the stored amounts themselves:
+monthly SUM(amount) as floats vs. SUM(amount_minor) as integers, both
+against the exact Decimal total.
+
+    cd backend && python bench/bench_money.py --rows 1000000
+    cd backend && python bench/bench_money.py --url postgresql://localhost/bench
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, Column, Float, Integer, MetaData, Table, create_engine, func, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from money import to_base_minor, to_minor  # noqa: E402
+
+metadata = MetaData()
+float_tx = Table(
+    'bench_float_tx', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('month', Integer, nullable=False),
+    Column('amount', Float, nullable=False),
+    Column('exchange_rate', Float, nullable=False),
+)
+int_tx = Table(
+    'bench_int_tx', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('month', Integer, nullable=False),
+    Column('amount_minor', BigInteger, nullable=False),
+    Column('amount_base', BigInteger, nullable=False),
+)
+
+
+def generate(rows, seed=0):
+    rnd = random.Random(seed)
+    for _ in range(rows):
+        yield rnd.randrange(48), f'{rnd.uniform(0.01, 2000):.2f}', rnd.choice(['1.0', '3.71', '4.02', '0.0264'])
+
+
+def load(engine, rows, batch=50000):
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    exact = {}
+    data = list(generate(rows))
+    with engine.begin() as conn:
+        for start in range(0, rows, batch):
+            chunk = data[start:start + batch]
+            conn.execute(float_tx.insert(), [
+                {'month': m, 'amount': float(a), 'exchange_rate': float(r)} for m, a, r in chunk
+            ])
+            conn.execute(int_tx.insert(), [
+                {'month': m, 'amount_minor': to_minor(a, 'ILS'), 'amount_base': to_base_minor(a, r, 'ILS')}
+                for m, a, r in chunk
+            ])
+    for month, amount, rate in data:
+        exact[month] = exact.get(month, Decimal(0)) + Decimal(amount)
+    return exact
+
+
+def timed(engine, query, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        with engine.connect() as conn:
+            started = time.perf_counter()
+            result = dict(conn.execute(query).all())
+            best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--url', default='sqlite://', help='database to run on (default: in-memory SQLite)')
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    started = time.perf_counter()
+    exact = load(engine, args.rows)
+    print(f'{args.rows} rows loaded in {time.perf_counter() - started:.1f}s ({engine.dialect.name})')
+
+    float_time, _ = timed(engine, select(
+        float_tx.c.month, func.sum(float_tx.c.amount * float_tx.c.exchange_rate)
+    ).group_by(float_tx.c.month), args.repeat)
+    int_time, _ = timed(engine, select(
+        int_tx.c.month, func.sum(int_tx.c.amount_base)
+    ).group_by(int_tx.c.month), args.repeat)
+    print(f'float SUM(amount * exchange_rate): {float_time * 1000:8.1f} ms')
+    print(f'int   SUM(amount_base):            {int_time * 1000:8.1f} ms  ({float_time / int_time:.2f}x)')
+
+    _, float_sums = timed(engine, select(float_tx.c.month, func.sum(float_tx.c.amount)).group_by(float_tx.c.month), 1)
+    _, int_sums = timed(engine, select(int_tx.c.month, func.sum(int_tx.c.amount_minor)).group_by(int_tx.c.month), 1)
+    for label, sums in (('float SUM(amount)      ', {m: Decimal(v) for m, v in float_sums.items()}),
+                        ('int   SUM(amount_minor)', {m: Decimal(v) / 100 for m, v in int_sums.items()})):
+        errors = [abs(sums[m] - exact[m]) for m in exact]
+        print(f'{label}: {sum(e == 0 for e in errors)}/{len(exact)} monthly totals exact, '
+              f'max error {max(errors):.2E}')
+    metadata.drop_all(engine)
+
+
+if __name__ == '__main__':
+    main()
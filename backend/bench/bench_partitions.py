@@ -0,0 +1,133 @@
+"""Query latency on a large Postgres `transaction` table, before and after
+partition_transactions.py.
+
+Seeds --rows transactions spread over --users users and --years years
+(generated server-side), then times the queries the app runs against the
+table, first on the plain table and then after converting it, and reports
+percentiles for each. The plain table gets the same (user_id, date) index
+the conversion creates, so only the partitioning differs. The database is
+emptied first.
+
+    cd backend && python bench/bench_partitions.py --url postgresql://localhost/bench
+    cd backend && python bench/bench_partitions.py --url postgresql://localhost/bench --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from sqlalchemy import text  # noqa: E402
+
+from App import create_app  # noqa: E402
+from models import db  # noqa: E402
+from partition_transactions import partition_transactions  # noqa: E402
+
+FIRST_YEAR = 2016
+
+QUERIES = {
+    # /api/analytics for one year (what a date-bounded view reads)
+    'user, one year': (
+        'SELECT type, category, SUM(amount_base) FROM "transaction" '
+        'WHERE user_id = :user AND date >= :start AND date < :end GROUP BY type, category',
+        'year',
+    ),
+    # insights.py / archive.py style scan of one month across all users
+    'all users, one month': (
+        'SELECT COUNT(*), SUM(amount_base) FROM "transaction" WHERE date >= :start AND date < :end',
+        'month',
+    ),
+    # /api/analytics without a date bound reads every partition
+    'user, all years': (
+        'SELECT type, category, SUM(amount_base) FROM "transaction" '
+        'WHERE user_id = :user GROUP BY type, category',
+        None,
+    ),
+}
+
+
+def seed(rows, users, years):
+    db.drop_all()
+    db.create_all()
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO \"user\" (username, email, password_hash, change_version) "
+            "SELECT 'bench' || i, 'bench' || i || '@example.com', 'x', 1 FROM generate_series(1, :users) i"
+        ), {'users': users})
+        conn.execute(text(
+            "INSERT INTO \"transaction\" (type, category, amount_minor, amount_base, description, date, "
+            "user_id, currency, exchange_rate, version) "
+            "SELECT CASE WHEN random() < 0.2 THEN 'income' ELSE 'expense' END, "
+            "'cat' || (random() * 20)::int, amount, amount, NULL, "
+            ":first + (random() * (:days - 1))::int, 1 + (random() * (:users - 1))::int, 'ILS', 1.0, 1 "
+            "FROM (SELECT (random() * 100000)::bigint AS amount FROM generate_series(1, :rows)) r"
+        ), {
+            'rows': rows,
+            'users': users,
+            'first': datetime.date(FIRST_YEAR, 1, 1),
+            'days': (datetime.date(FIRST_YEAR + years, 1, 1) - datetime.date(FIRST_YEAR, 1, 1)).days,
+        })
+        conn.execute(text('CREATE INDEX ix_transaction_user_date ON "transaction" (user_id, date)'))
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('VACUUM ANALYZE "transaction"'))
+
+
+def run_queries(users, years, repeat):
+    rnd = random.Random(1)
+    results = {}
+    with db.engine.connect() as conn:
+        for name, (sql, span) in QUERIES.items():
+            latencies = []
+            for _ in range(repeat):
+                year = FIRST_YEAR + rnd.randrange(years)
+                if span == 'year':
+                    start, end = datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+                else:
+                    month = rnd.randrange(1, 13)
+                    start = datetime.date(year, month, 1)
+                    end = datetime.date(year + month // 12, month % 12 + 1, 1)
+                params = {'user': rnd.randrange(1, users + 1), 'start': start, 'end': end}
+                started = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                latencies.append(time.perf_counter() - started)
+            results[name] = latencies
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', required=True, help='Postgres database URL (emptied first)')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200, help='runs per query')
+    args = parser.parse_args()
+
+    with create_app({'SQLALCHEMY_DATABASE_URI': args.url, 'AUTO_CREATE_SCHEMA': False}).app_context():
+        started = time.perf_counter()
+        seed(args.rows, args.users, args.years)
+        print(f'seeded {args.rows} rows in {time.perf_counter() - started:.0f}s')
+
+        plain = run_queries(args.users, args.years, args.repeat)
+        started = time.perf_counter()
+        partition_transactions()
+        print(f'partitioned in {time.perf_counter() - started:.0f}s')
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('ANALYZE "transaction"'))
+        partitioned = run_queries(args.users, args.years, args.repeat)
+
+    for name in QUERIES:
+        line = f'{name:<21}'
+        for label, results in (('plain', plain), ('partitioned', partitioned)):
+            q = statistics.quantiles(results[name], n=100, method='inclusive')
+            line += f' | {label} p50 {q[49] * 1000:7.2f} ms p99 {q[98] * 1000:7.2f} ms'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
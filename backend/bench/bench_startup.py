@@ -0,0 +1,87 @@
+"""Cold start: process start to first response.
+
+Every run is a fresh interpreter that imports App, builds the app, serves
+/api/health and then /years (the first request that touches the database,
+so it includes the lazy schema check) through the test client. --ref
+measures another git revision of backend/ the same way, e.g. the commit
+before the create_app() factory, which did all of this at import time.
+
+    cd backend && python bench/bench_startup.py --runs 10
+    cd backend && DATABASE_URL=postgresql://... python bench/bench_startup.py --ref <rev>
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, '.')
+import App
+imported = time.perf_counter()
+app = App.create_app() if hasattr(App, 'create_app') else App.app
+created = time.perf_counter()
+client = app.test_client()
+assert client.get('/api/health').status_code == 200
+health = time.perf_counter()
+assert client.get('/years').status_code == 200
+first_db = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_response': health - started,
+    'first_db_response': first_db - started,
+}))
+'''
+
+
+def measure(backend_dir, runs, env):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', CHILD], cwd=backend_dir, env=env,
+                             capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if out.returncode != 0:
+            raise SystemExit(out.stderr)
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        sample['process_wall'] = wall
+        samples.append(sample)
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def report(label, result):
+    print(f'{label}:')
+    for key, seconds in result.items():
+        print(f'  {key:<18} {seconds * 1000:8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--ref', help='git revision to compare against')
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    if not env.get('DATABASE_URL'):
+        env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+
+    report(f'current tree (median of {args.runs})', measure(BACKEND, args.runs, env))
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = subprocess.run(['git', 'archive', args.ref, 'backend'],
+                                     cwd=os.path.dirname(BACKEND),
+                                     capture_output=True, check=True).stdout
+            subprocess.run(['tar', '-x', '-C', tmp], input=archive, check=True)
+            report(f'{args.ref} (median of {args.runs})', measure(os.path.join(tmp, 'backend'), args.runs, env))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""check_username latency during a signup burst: in-memory index vs. database.
+
+Seeds --users accounts, then --threads clients each type new usernames
+(one /api/check_username per keystroke) and register every
+--signup-every-th of them through /api/signup. The same burst runs once
+with the username index and once with the previous per-keystroke query
+(made case-insensitive, using ix_user_username_lower), and reports
+check_username latency percentiles for each.
+
+    cd backend && python bench/bench_username.py --users 100000
+    cd backend && python bench/bench_username.py --url postgresql://localhost/bench
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import auth  # noqa: E402
+from App import create_app  # noqa: E402
+from models import db, User  # noqa: E402
+from username_index import UsernameIndex  # noqa: E402
+
+
+class DatabaseLookup:
+    """What check_username and signup did before the index."""
+
+    def is_taken(self, username):
+        return db.session.execute(
+            db.select(User.id).where(db.func.lower(User.username) == username.lower())
+        ).first() is not None
+
+    def add(self, username):
+        pass
+
+
+def seed(app, users):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for start in range(0, users, 10000):
+            db.session.execute(db.insert(User), [
+                {'username': f'seed{i}', 'email': f'seed{i}@example.com', 'password_hash': 'x'}
+                for i in range(start, min(start + 10000, users))
+            ])
+        db.session.commit()
+
+
+def burst(app, threads, names_per_thread, signup_every, seed_value):
+    latencies = []
+    lock = threading.Lock()
+
+    def client_thread(n):
+        rnd = random.Random(seed_value * 1000 + n)
+        client = app.test_client()
+        own = []
+        for k in range(names_per_thread):
+            name = f'{rnd.choice(["seed", "user", "anna", "max"])}{rnd.randrange(200000)}t{n}k{k}'
+            for end in range(3, len(name) + 1):
+                started = time.perf_counter()
+                response = client.get('/api/check_username', query_string={'username': name[:end]})
+                own.append(time.perf_counter() - started)
+                assert response.status_code == 200
+            if k % signup_every == 0:
+                response = client.post('/api/signup', json={
+                    'username': name, 'email': f'{name}@example.com', 'password': 'password'
+                })
+                assert response.status_code == 201, response.json
+        with lock:
+            latencies.extend(own)
+
+    pool = [threading.Thread(target=client_thread, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--names', type=int, default=30, help='usernames typed per client')
+    parser.add_argument('--signup-every', type=int, default=3)
+    parser.add_argument('--url', help='database URL (default: a temporary SQLite file)')
+    args = parser.parse_args()
+
+    url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'usernames.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': url, 'AUTO_CREATE_SCHEMA': False})
+    for mode, lookup in (('database', DatabaseLookup()), ('index', UsernameIndex(refresh_seconds=5))):
+        seed(app, args.users)
+        auth.username_index = lookup
+        if isinstance(lookup, UsernameIndex):
+            with app.app_context():
+                lookup.is_taken('warm-up')  # the index loads on first use
+        latencies, elapsed = burst(app, args.threads, args.names, args.signup_every, seed_value=1)
+        q = statistics.quantiles(latencies, n=100)
+        print(f'{mode:<9} {len(latencies)} checks in {elapsed:.1f}s: '
+              f'p50 {q[49] * 1000:.2f} ms, p95 {q[94] * 1000:.2f} ms, p99 {q[98] * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
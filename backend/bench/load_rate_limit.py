@@ -0,0 +1,144 @@
+"""Load test: does the server stay responsive while /api/login is abused?
+
+Starts gunicorn with the production config (gevent, one worker) on a
+temporary SQLite database, then for each scenario floods /api/login with
+wrong passwords for a real account (each one costs a password hash) from
+--attackers connections, rotating spoofed X-Forwarded-For values. A
+well-behaved client meanwhile polls /api/health and /api/check_username;
+its latency percentiles are reported together with the attackers' status
+codes. There is no proxy in front, so requests carry the X-Forwarded-For
+entry it would have appended.
+
+    cd backend && python bench/load_rate_limit.py --seconds 10 --attackers 16
+    cd backend && python bench/load_rate_limit.py --url postgresql://localhost/loadtest
+"""
+import argparse
+import collections
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SCENARIOS = (
+    ('no limiter', {'RATE_LIMIT_ENABLED': '0'}),
+    ('memory', {'RATE_LIMIT_BACKEND': 'memory'}),
+    ('database', {'RATE_LIMIT_BACKEND': 'database'}),
+)
+
+
+def seed(url):
+    from App import create_app
+    from models import db, User
+    with create_app({'SQLALCHEMY_DATABASE_URI': url, 'AUTO_CREATE_SCHEMA': False}).app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='victim', email='victim@example.com')
+        user.set_password('correct horse')
+        db.session.add(user)
+        db.session.commit()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(url, port, extra_env):
+    env = dict(os.environ, DATABASE_URL=url, AUTO_CREATE_SCHEMA='0', LOG_LEVEL='WARNING', **extra_env)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'App:create_app()',
+         '--bind', f'127.0.0.1:{port}', '--workers', '1'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit('server did not start')
+
+
+def attacker(port, stop, statuses, n):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    body = '{"username": "victim", "password": "guess"}'
+    i = 0
+    while not stop.is_set():
+        i += 1
+        # A spoofed address, then the one the proxy saw (TRUSTED_PROXY_HOPS=1)
+        headers = {'Content-Type': 'application/json',
+                   'X-Forwarded-For': f'10.{n}.{i // 256 % 256}.{i % 256}, 203.0.113.9'}
+        try:
+            conn.request('POST', '/api/login', body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            statuses[response.status] += 1
+        except OSError:
+            statuses['error'] += 1
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+
+def legitimate(port, stop, latencies):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while not stop.is_set():
+        for path in ('/api/health', '/api/check_username?username=newcomer'):
+            started = time.perf_counter()
+            conn.request('GET', path, headers={'X-Forwarded-For': '198.51.100.1'})
+            conn.getresponse().read()
+            latencies.append(time.perf_counter() - started)
+        time.sleep(0.05)
+
+
+def run(url, seconds, attackers, extra_env):
+    port = free_port()
+    process = start_server(url, port, extra_env)
+    stop = threading.Event()
+    statuses = collections.Counter()
+    latencies = []
+    threads = [threading.Thread(target=attacker, args=(port, stop, statuses, n)) for n in range(attackers)]
+    threads.append(threading.Thread(target=legitimate, args=(port, stop, latencies)))
+    try:
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        process.terminate()
+        process.wait(15)
+    return statuses, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--attackers', type=int, default=16)
+    parser.add_argument('--url', help='database URL, emptied first (default: temporary SQLite files)')
+    args = parser.parse_args()
+
+    for name, extra_env in SCENARIOS:
+        url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load.db')
+        seed(url)
+        statuses, latencies = run(url, args.seconds, args.attackers, extra_env)
+        q = statistics.quantiles(latencies, n=100, method='inclusive')
+        attempts = ', '.join(f'{code}: {count}' for code, count in sorted(statuses.items(), key=str))
+        print(f'{name:<10} legit p50 {q[49] * 1000:7.1f} ms  p99 {q[98] * 1000:7.1f} ms  '
+              f'max {max(latencies) * 1000:7.1f} ms | attacker responses {attempts}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from flask import Blueprint, g, jsonify, request
+
+from auth import login_required
+from events import queue_event
+from models import db, Category, Tombstone, bump_change_version
+from replicas import replica_read
+
+bp = Blueprint('categories', __name__)
+
+
+@bp.route('/api/categories', methods=['GET'])
+@login_required
+@replica_read
+def get_all_categories():
+    categories = Category.query.filter_by(user_id=g.user_id).all()
+    return jsonify([
+        {"name": c.name, "type": c.type}
+        for c in categories
+    ])
+
+
+@bp.route('/api/categories/<type>', methods=['GET'])
+@login_required
+@replica_read
+def get_categories(type):
+    categories = Category.query.filter_by(
+        type=type,
+        user_id=g.user_id
+    ).all()
+    return jsonify([cat.name for cat in categories])
+
+
+
+@bp.route('/api/categories', methods=['POST'])
+@login_required
+def add_category():
+    user_id = g.user_id
+    data = request.json
+    name = data.get('name')
+    type_ = data.get('type')
+
+    if not name or not type_:
+        return jsonify({'error': 'Missing data'}), 400
+
+    existing = Category.query.filter_by(name=name, type=type_, user_id=user_id).first()
+    if not existing:
+        category = Category(
+            name=name,
+            type=type_,
+            user_id=user_id,
+            version=bump_change_version(user_id)
+        )
+        db.session.add(category)
+        db.session.flush()
+        queue_event(db.session, user_id, 'category', 'created', [category.id], category.version)
+        db.session.commit()
+
+    categories = Category.query.filter_by(type=type_, user_id=user_id).all()
+    return jsonify([cat.name for cat in categories])
+
+
+
+@bp.route('/api/category/delete/<name>', methods=['DELETE'])
+@login_required
+def delete_category(name):
+    user_id = g.user_id
+    category = Category.query.filter_by(name=name, user_id=user_id).first()
+    if category:
+        version = bump_change_version(user_id)
+        db.session.add(Tombstone(
+            user_id=user_id,
+            entity='category',
+            entity_id=category.id,
+            version=version
+        ))
+        queue_event(db.session, user_id, 'category', 'deleted', [category.id], version)
+        db.session.delete(category)
+        db.session.commit()
+    return jsonify({'message': 'Category deleted'})
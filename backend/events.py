@@ -0,0 +1,250 @@
+import collections
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, EventLog
+
+# How many recent events per user are kept for Last-Event-ID resume
+REPLAY_BUFFER_SIZE = 200
+
+
+class EventBroker:
+    """In-process pub/sub: one queue per open /api/events stream."""
+
+    def __init__(self, replay_size=REPLAY_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = collections.defaultdict(set)
+        self._recent = collections.defaultdict(lambda: collections.deque(maxlen=replay_size))
+
+    def subscribe(self, user_id):
+        q = queue.Queue()
+        with self._lock:
+            self._subscribers[user_id].add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def replay(self, user_id, last_event_id):
+        """Buffered events newer than last_event_id, oldest first."""
+        with self._lock:
+            recent = list(self._recent.get(user_id, ()))
+        return [e for e in recent if e['id'] > last_event_id]
+
+    def stage(self, session):
+        """Called just before `session` commits; brokers that store events write them here."""
+
+    def publish(self, user_id, evt):
+        self._deliver(user_id, evt)
+
+    def _deliver(self, user_id, evt):
+        with self._lock:
+            self._recent[user_id].append(evt)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for q in subscribers:
+            q.put(evt)
+
+
+class RedisEventBroker(EventBroker):
+    """Fans events out across gunicorn workers through Redis pub/sub.
+
+    Every worker keeps its own local subscribers and replay buffer; a
+    background thread feeds messages from Redis into them.
+    """
+
+    channel_prefix = 'money-tracker:events:'
+
+    def __init__(self, url, replay_size=REPLAY_BUFFER_SIZE):
+        super().__init__(replay_size)
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(self.channel_prefix + '*')
+            self._listener = threading.Thread(target=self._listen, args=(pubsub,), daemon=True)
+            self._listener.start()
+
+    def _listen(self, pubsub):
+        for message in pubsub.listen():
+            try:
+                channel = message['channel'].decode()
+                user_id = int(channel[len(self.channel_prefix):])
+                self._deliver(user_id, json.loads(message['data']))
+            except Exception:
+                logging.exception('Dropping malformed event message')
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, evt):
+        # Delivery (including to this worker) happens via the listener
+        self._ensure_listener()
+        self._redis.publish(self.channel_prefix + str(user_id), json.dumps(evt))
+
+
+class DatabaseEventBroker(EventBroker):
+    """Fans events out across gunicorn workers through the event_log table.
+
+    Events are inserted in the same transaction as the change they describe,
+    and every worker with open streams polls the table every
+    EVENTS_POLL_SECONDS. Resume reads the table too, so it works whichever
+    worker the client reconnects to. Rows older than
+    EVENTS_RETENTION_SECONDS are deleted.
+
+    Ids are allocated at insert but become visible at commit, so a poll can
+    see id 11 before id 10 commits. Skipped ids are re-checked for
+    GAP_SECONDS before they are given up as rolled back.
+    """
+
+    GAP_SECONDS = 30
+    MAX_GAP = 1000
+
+    def __init__(self, replay_size=REPLAY_BUFFER_SIZE):
+        super().__init__(replay_size)
+        self.replay_size = replay_size
+        self.poll_seconds = float(os.environ.get('EVENTS_POLL_SECONDS', 0.5))
+        self.retention_seconds = float(os.environ.get('EVENTS_RETENTION_SECONDS', 3600))
+        self._engine = None
+        self._listener = None
+        self._last_id = 0
+        self._gaps = {}  # log id -> monotonic time to stop waiting for it
+        self._next_sweep = 0.0
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            # Needs the app context of the request that subscribes
+            self._engine = db.engine
+            with self._engine.connect() as conn:
+                self._last_id = conn.execute(db.select(db.func.max(EventLog.id))).scalar() or 0
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                with self._engine.connect() as conn:
+                    self._poll(conn)
+            except Exception:
+                logging.exception('Polling the event log failed')
+            time.sleep(self.poll_seconds)
+
+    def _poll(self, conn):
+        rows = conn.execute(
+            db.select(EventLog.id, EventLog.user_id, EventLog.payload)
+            .where(db.or_(EventLog.id > self._last_id, EventLog.id.in_(list(self._gaps))))
+            .order_by(EventLog.id)
+        ).all()
+        now = time.monotonic()
+        for log_id, user_id, payload in rows:
+            if log_id > self._last_id:
+                for missing in range(max(self._last_id + 1, log_id - self.MAX_GAP), log_id):
+                    self._gaps[missing] = now + self.GAP_SECONDS
+                self._last_id = log_id
+            self._gaps.pop(log_id, None)
+            self._deliver(user_id, json.loads(payload))
+        self._gaps = {log_id: until for log_id, until in self._gaps.items() if until > now}
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def replay(self, user_id, last_event_id):
+        rows = db.session.execute(
+            db.select(EventLog.payload)
+            .where(EventLog.user_id == user_id, EventLog.version > last_event_id)
+            .order_by(EventLog.version)
+            .limit(self.replay_size)
+        ).scalars()
+        return [json.loads(payload) for payload in rows]
+
+    def stage(self, session):
+        # Popped here, so _publish_pending_events has nothing left to send
+        pending = session.info.pop('pending_events', None)
+        if not pending:
+            return
+        now = time.time()
+        session.execute(db.insert(EventLog), [{
+            'user_id': user_id,
+            'version': evt['id'],
+            'payload': json.dumps(evt),
+            'created_at': now,
+        } for user_id, evt in pending])
+        if now >= self._next_sweep:
+            self._next_sweep = now + 60
+            session.execute(db.delete(EventLog).where(EventLog.created_at < now - self.retention_seconds))
+
+
+def create_broker():
+    """EVENTS_REDIS_URL picks Redis, EVENTS_BROKER=database the event_log
+    table (both shared by all workers); otherwise events stay in-process."""
+    url = os.environ.get('EVENTS_REDIS_URL')
+    if url:
+        return RedisEventBroker(url)
+    if os.environ.get('EVENTS_BROKER') == 'database':
+        return DatabaseEventBroker()
+    return EventBroker()
+
+
+broker = create_broker()
+
+
+def queue_event(session, user_id, entity, action, ids, version, **extra):
+    """Stage an event on the session; it is published only once the session commits.
+
+    The version doubles as the SSE event id, so queue at most one event per version.
+    """
+    session.info.setdefault('pending_events', []).append((user_id, dict(
+        extra,
+        id=version,
+        entity=entity,
+        action=action,
+        ids=list(ids),
+        version=version,
+    )))
+
+
+@event.listens_for(Session, 'before_commit')
+def _stage_pending_events(session):
+    broker.stage(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_events(session):
+    for user_id, evt in session.info.pop('pending_events', []):
+        try:
+            broker.publish(user_id, evt)
+        except Exception:
+            logging.exception('Failed to publish event for user %s', user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_pending_events(session, previous_transaction):
+    session.info.pop('pending_events', None)
+
+
+def format_sse(evt):
+    return f"id: {evt['id']}\nevent: {evt['entity']}\ndata: {json.dumps(evt)}\n\n"
@@ -0,0 +1,47 @@
+"""Gunicorn settings, loaded by the Procfile.
+
+Every open /api/events stream keeps its response running for as long as the
+tab is open. With thread workers each stream pins an OS thread, so a few
+dozen idle tabs starve every other endpoint. gevent workers run each request
+in a greenlet instead: an idle stream costs a socket and a few KB, and the
+event queues, locks and DB waits it blocks on all yield to other requests.
+"""
+import os
+
+from gevent import monkey
+
+# Patch before the app is imported: it is preloaded in the master below
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg  # noqa: E402
+
+# psycopg2 waits on sockets in C; hand those waits to gevent as well
+patch_psycopg()
+
+import logging_config  # noqa: E402
+
+# The app is preloaded in the master, which only forks: log from a listener
+# thread started in each worker, not one the workers would inherit half-dead
+logging_config.defer_listener()
+
+worker_class = 'gevent'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Events must reach streams held by every worker, not just the one that
+# handled the write: without Redis, share them through the database
+if not os.environ.get('EVENTS_REDIS_URL'):
+    os.environ.setdefault('EVENTS_BROKER', 'database')
+# Simultaneous connections per worker, idle event streams included
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 2000))
+preload_app = True
+# Event streams never finish by themselves and browsers reconnect on their
+# own, so restarts should not wait the default 30s for them
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 10))
+
+
+def post_fork(server, worker):
+    logging_config.start_listener()
+
+
+def worker_exit(server, worker):
+    # Before the interpreter tears down the worker's hub
+    logging_config.stop_listener()
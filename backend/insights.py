@@ -0,0 +1,215 @@
+"""Offline spending-insights job.
+
+Computes, for every user, "unusual spend" (z-score of a month against the
+previous HISTORY_MONTHS) and "biggest changes this month" (month-over-month
+movers) per category, and stores them in the Insight table that
+/api/insights serves. The month scored is the last complete one: a month
+in progress would look like a collapse in spending. Anomalies are months
+well above the usual amount; drops only show up as movers. Users are processed in chunks: one query fetches the
+monthly per-category series for a whole chunk (archived years included),
+NumPy scores it, and chunks run across a process pool.
+
+Meant to run from a scheduler (e.g. a nightly cron job):
+
+    cd backend && python insights.py --workers 4 --chunk-size 500
+"""
+import argparse
+import datetime
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models import db, ArchivedSummary, Insight, Transaction, User
+
+HISTORY_MONTHS = 12
+MIN_HISTORY_MONTHS = 3  # months with spend needed before z-scores mean anything
+ANOMALY_Z = 2.5  # only upward: a quiet month is not "unusual spend"
+TOP_MOVERS = 3
+
+
+def _month_index(date):
+    return date.year * 12 + date.month - 1
+
+
+def _month_label(month_idx):
+    return f"{month_idx // 12:04d}-{month_idx % 12 + 1:02d}"
+
+
+def fetch_series(user_ids, target_idx):
+    """Monthly totals for HISTORY_MONTHS + 1 months ending at target_idx.
+
+    Returns (keys, matrix): keys[i] = (user_id, type, category) and
+    matrix[i] the dense series in minor units, oldest month first.
+    """
+    first_idx = target_idx - HISTORY_MONTHS
+    first_day = datetime.date(first_idx // 12, first_idx % 12 + 1, 1)
+    month_idx = db.extract('year', Transaction.date) * 12 + db.extract('month', Transaction.date) - 1
+    hot = (
+        db.select(
+            Transaction.user_id.label('user_id'),
+            Transaction.type.label('type'),
+            Transaction.category.label('category'),
+            month_idx.label('month_idx'),
+            Transaction.amount_base.label('total'),
+        )
+        .where(Transaction.user_id.in_(user_ids), Transaction.date >= first_day)
+    )
+    archived_idx = ArchivedSummary.year * 12 + ArchivedSummary.month - 1
+    cold = (
+        db.select(
+            ArchivedSummary.user_id,
+            ArchivedSummary.type,
+            ArchivedSummary.category,
+            archived_idx,
+            ArchivedSummary.total_base,
+        )
+        .where(ArchivedSummary.user_id.in_(user_ids), archived_idx >= first_idx)
+    )
+    rows = db.union_all(hot, cold).subquery('rows')
+    result = db.session.execute(
+        db.select(rows.c.user_id, rows.c.type, rows.c.category, rows.c.month_idx, db.func.sum(rows.c.total))
+        .where(rows.c.month_idx <= target_idx)
+        .group_by(rows.c.user_id, rows.c.type, rows.c.category, rows.c.month_idx)
+    ).all()
+
+    index = {}
+    cells = []
+    for user_id, type_, category, idx, total in result:
+        row = index.setdefault((user_id, type_, category), len(index))
+        cells.append((row, int(idx) - first_idx, int(total)))
+    matrix = np.zeros((len(index), HISTORY_MONTHS + 1), dtype=np.int64)
+    if cells:
+        r, c, v = np.array(cells, dtype=np.int64).T
+        matrix[r, c] = v
+    return list(index), matrix
+
+
+def score_series(matrix):
+    """Vectorised z-scores and month-over-month deltas for every series."""
+    history = matrix[:, :-1].astype(np.float64)
+    current = matrix[:, -1].astype(np.float64)
+    mean = history.mean(axis=1)
+    std = history.std(axis=1)
+    active = (history != 0).sum(axis=1) >= MIN_HISTORY_MONTHS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where((std > 0) & active, (current - mean) / std, 0.0)
+        previous = history[:, -1]
+        delta = current - previous
+        relative = np.where(previous != 0, delta / np.abs(previous), np.sign(delta))
+    return mean, z, previous, delta, relative
+
+
+def compute_insights(user_ids, target_idx):
+    keys, matrix = fetch_series(user_ids, target_idx)
+    if not keys:
+        return []
+    mean, z, previous, delta, relative = score_series(matrix)
+    month = _month_label(target_idx)
+    current = matrix[:, -1]
+
+    insights = []
+    for i in np.flatnonzero(z >= ANOMALY_Z):
+        user_id, type_, category = keys[i]
+        insights.append({
+            'user_id': user_id, 'kind': 'anomaly', 'month': month, 'type': type_, 'category': category,
+            'value': int(current[i]), 'baseline': int(round(mean[i])), 'score': float(z[i]),
+        })
+
+    # Top movers per user: order rows by user, then by |delta| descending
+    users = np.array([k[0] for k in keys])
+    order = np.lexsort((-np.abs(delta), users))
+    taken = {}
+    for i in order:
+        if delta[i] == 0:
+            continue
+        user_id, type_, category = keys[i]
+        if taken.get(user_id, 0) >= TOP_MOVERS:
+            continue
+        taken[user_id] = taken.get(user_id, 0) + 1
+        insights.append({
+            'user_id': user_id, 'kind': 'mover', 'month': month, 'type': type_, 'category': category,
+            'value': int(current[i]), 'baseline': int(previous[i]), 'score': float(relative[i]),
+        })
+    return insights
+
+
+def process_chunk(user_ids, target_idx):
+    """Recompute and store insights for one chunk of users. Returns rows written."""
+    insights = compute_insights(user_ids, target_idx)
+    now = datetime.datetime.utcnow()
+    db.session.execute(db.delete(Insight).where(Insight.user_id.in_(user_ids)))
+    if insights:
+        db.session.execute(db.insert(Insight), [dict(row, computed_at=now) for row in insights])
+    db.session.commit()
+    return len(insights)
+
+
+_worker = {}
+
+
+def _init_worker():
+    from App import create_app
+    app = create_app({'AUTO_CREATE_SCHEMA': False})
+    _worker['ctx'] = app.app_context()
+    _worker['ctx'].push()
+
+
+def _run_chunk(args):
+    user_ids, target_idx = args
+    try:
+        return len(user_ids), process_chunk(user_ids, target_idx)
+    finally:
+        db.session.remove()
+
+
+def last_complete_month(today=None):
+    return _month_index(today or datetime.date.today()) - 1
+
+
+def run_insights_job(target_month=None, chunk_size=500, workers=None):
+    """Process all users; returns (users, insights, seconds). Needs an app context."""
+    target_idx = _month_index(target_month) if target_month else last_complete_month()
+    user_ids = list(db.session.execute(db.select(User.id).order_by(User.id)).scalars())
+    db.session.remove()
+    chunks = [(user_ids[i:i + chunk_size], target_idx) for i in range(0, len(user_ids), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    written = 0
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            written += _run_chunk(chunk)[1]
+    else:
+        # spawn: every worker builds its own app and connection pool
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        ) as pool:
+            for _, count in pool.map(_run_chunk, chunks):
+                written += count
+    elapsed = time.perf_counter() - started
+    logging.info('Insights: %d users, %d insights in %.2fs (%.1f users/s)',
+                 len(user_ids), written, elapsed, len(user_ids) / elapsed if elapsed else 0.0)
+    return len(user_ids), written, elapsed
+
+
+if __name__ == '__main__':
+    from App import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--month', help='YYYY-MM to score (default: last complete month)')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None, help='default: CPU count')
+    args = parser.parse_args()
+    month = datetime.datetime.strptime(args.month, '%Y-%m').date() if args.month else None
+
+    with create_app({'AUTO_CREATE_SCHEMA': False}).app_context():
+        db.create_all()
+        users, written, elapsed = run_insights_job(month, args.chunk_size, args.workers)
+    print(f'{users} users, {written} insights in {elapsed:.2f}s '
+          f'({users / elapsed if elapsed else 0.0:.1f} users/s)')
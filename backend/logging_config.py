@@ -0,0 +1,204 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+# Libraries that are far too chatty below WARNING
+DEFAULT_LOGGER_LEVELS = {
+    'sqlalchemy': 'WARNING',
+    'urllib3': 'WARNING',
+    'werkzeug': 'WARNING',
+    'httpx': 'WARNING',
+}
+
+access_logger = logging.getLogger('money_tracker.access')
+
+_state = {'queue': None, 'handlers': None, 'queue_handler': None, 'listener': None, 'deferred': False}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; runs on the listener thread."""
+
+    EXTRA_FIELDS = ('request_id', 'user_id', 'method', 'path', 'status', 'duration_ms')
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+JsonFormatter.converter = time.gmtime
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps request/user ids on records while still on the request thread."""
+
+    def filter(self, record):
+        if has_request_context():
+            if getattr(record, 'request_id', None) is None:
+                record.request_id = g.get('request_id')
+            if getattr(record, 'user_id', None) is None:
+                record.user_id = g.get('user_id')
+        return True
+
+
+class SuccessSampler(logging.Filter):
+    """Keeps a fraction of successful access records; errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        status = getattr(record, 'status', None)
+        if status is None or status >= 400 or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the record (tracebacks included) on the
+    # calling thread; only resolve the message and leave the rest to the listener
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in (spec or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def defer_listener():
+    """Write records directly until start_listener() is called.
+
+    For a process that forks its workers after loading the app (the gunicorn
+    master with preload_app): a listener started there would be copied into
+    every worker without its thread. gunicorn.conf.py starts one per worker
+    from post_fork instead.
+    """
+    _state['deferred'] = True
+
+
+def _use_handlers(*handlers):
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    for handler in handlers:
+        root.addHandler(handler)
+
+
+def start_listener():
+    """Hand records to a listener thread from here on."""
+    if _state['queue'] is None or _state['listener'] is not None:
+        return
+    listener = logging.handlers.QueueListener(
+        _state['queue'], *_state['handlers'], respect_handler_level=True
+    )
+    listener.start()
+    _state['listener'] = listener
+    _use_handlers(_state['queue_handler'])
+
+
+def stop_listener():
+    """Write out what is still queued and go back to writing directly.
+
+    Drains the queue on the calling thread rather than joining the listener:
+    at exit under gevent the listener's greenlet may never be scheduled
+    again, and QueueListener.stop() fails with LoopExit.
+    """
+    listener = _state['listener']
+    if listener is None:
+        return
+    _state['listener'] = None
+    _use_handlers(*_state['handlers'])
+    while True:
+        try:
+            record = _state['queue'].get_nowait()
+        except queue.Empty:
+            break
+        if record is not listener._sentinel:
+            listener.handle(record)
+
+
+def configure_logging(app):
+    app.before_request(_start_request_timer)
+    app.after_request(_log_request)
+
+    if _state['queue'] is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _state['handlers'] = [stream]
+    _state['queue'] = queue.SimpleQueue()
+
+    stream.addFilter(RequestContextFilter())
+    handler = DeferredQueueHandler(_state['queue'])
+    handler.addFilter(RequestContextFilter())
+    _state['queue_handler'] = handler
+
+    _use_handlers(stream)
+    root = logging.getLogger()
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    levels = dict(DEFAULT_LOGGER_LEVELS)
+    levels.update(_parse_levels(os.environ.get('LOG_LEVELS')))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    access_logger.addFilter(SuccessSampler(float(os.environ.get('LOG_SUCCESS_SAMPLE_RATE', 0.1))))
+
+    if not _state['deferred']:
+        start_listener()
+    atexit.register(stop_listener)
+
+
+def _start_request_timer():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+
+
+def _log_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    response.headers['X-Request-ID'] = g.request_id
+    status = response.status_code
+    access_logger.log(
+        logging.WARNING if status >= 500 else logging.INFO,
+        '%s %s %s', request.method, request.path, status,
+        extra={
+            'method': request.method,
+            'path': request.path,
+            'status': status,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+    )
+    return response
@@ -0,0 +1,73 @@
+"""One-off backfill: float `transaction.amount` -> integer minor units.
+
+Adds `user.home_currency`, `transaction.amount_minor` and
+`transaction.amount_base`, fills them from the old float `amount` and
+`exchange_rate` columns, then drops `amount`. Safe to re-run.
+
+    cd backend && python migrate_minor_units.py
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from App import create_app
+from models import db
+from money import to_minor, to_base_minor
+
+BATCH_SIZE = 1000
+
+
+def _columns(table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def migrate():
+    is_postgres = db.engine.dialect.name == 'postgresql'
+
+    with db.engine.begin() as conn:
+        if 'home_currency' not in _columns('user'):
+            conn.execute(text(
+                "ALTER TABLE \"user\" ADD COLUMN home_currency VARCHAR(10) NOT NULL DEFAULT 'ILS'"
+            ))
+        tx_columns = _columns('transaction')
+        if 'amount' not in tx_columns:
+            logging.info('transaction.amount already migrated')
+            return
+        if 'amount_minor' not in tx_columns:
+            conn.execute(text('ALTER TABLE "transaction" ADD COLUMN amount_minor BIGINT'))
+        if 'amount_base' not in tx_columns:
+            conn.execute(text('ALTER TABLE "transaction" ADD COLUMN amount_base BIGINT'))
+
+    select_batch = text(
+        'SELECT t.id, t.amount, t.currency, t.exchange_rate, u.home_currency '
+        'FROM "transaction" t JOIN "user" u ON u.id = t.user_id '
+        'WHERE t.amount_minor IS NULL ORDER BY t.id LIMIT :limit'
+    )
+    update_row = text(
+        'UPDATE "transaction" SET amount_minor = :amount_minor, amount_base = :amount_base '
+        'WHERE id = :id'
+    )
+    migrated = 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(select_batch, {'limit': BATCH_SIZE}).all()
+            if not rows:
+                break
+            conn.execute(update_row, [{
+                'id': r.id,
+                'amount_minor': to_minor(r.amount, r.currency),
+                'amount_base': to_base_minor(r.amount, r.exchange_rate or 1.0, r.home_currency),
+            } for r in rows])
+        migrated += len(rows)
+        logging.info('Backfilled %d transactions', migrated)
+
+    with db.engine.begin() as conn:
+        if is_postgres:
+            conn.execute(text('ALTER TABLE "transaction" ALTER COLUMN amount_minor SET NOT NULL'))
+            conn.execute(text('ALTER TABLE "transaction" ALTER COLUMN amount_base SET NOT NULL'))
+        conn.execute(text('ALTER TABLE "transaction" DROP COLUMN amount'))
+
+
+if __name__ == '__main__':
+    with create_app({'AUTO_CREATE_SCHEMA': False}).app_context():
+        migrate()
@@ -0,0 +1,73 @@
+"""Bring an existing database up to the current models.
+
+db.create_all() only creates missing tables; it never alters existing ones.
+This adds the columns and indexes that later changes introduced on `user`,
+`transaction` and `category` (change versions, the case-insensitive
+username index, the read-your-writes timestamp), and backfills them. Every step checks first,
+so it is safe to re-run.
+
+    cd backend && python migrate_schema.py
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from App import create_app
+from models import db
+
+
+def _columns(table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def _add_column(conn, table, column, ddl):
+    if column not in _columns(table):
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+        logging.info('Added %s.%s', table, column)
+
+
+def add_change_versions(conn):
+    """Per-user change versions for /api/sync."""
+    timestamp = 'TIMESTAMP' if conn.dialect.name == 'postgresql' else 'DATETIME'
+    _add_column(conn, 'user', 'change_version', 'BIGINT NOT NULL DEFAULT 0')
+    for table in ('transaction', 'category'):
+        _add_column(conn, table, 'version', 'BIGINT NOT NULL DEFAULT 0')
+        _add_column(conn, table, 'updated_at', timestamp)
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_version ON "{table}" (version)'))
+
+    # Rows written before versions existed start at 1, so that a full pull
+    # (since=0) returns them; new writes are numbered after them
+    conn.execute(text('UPDATE "transaction" SET version = 1 WHERE version = 0'))
+    conn.execute(text('UPDATE category SET version = 1 WHERE version = 0'))
+    conn.execute(text('UPDATE "user" SET change_version = 1 WHERE change_version = 0'))
+
+
+def add_last_write_at(conn):
+    """Per-user last write time, which replica routing reads."""
+    _add_column(conn, 'user', 'last_write_at', 'DOUBLE PRECISION' if conn.dialect.name == 'postgresql' else 'FLOAT')
+
+
+def add_username_lower_index(conn):
+    """Case-insensitive unique usernames, which signup relies on."""
+    clashes = conn.execute(text(
+        'SELECT lower(username) FROM "user" GROUP BY lower(username) HAVING COUNT(*) > 1'
+    )).scalars().all()
+    if clashes:
+        raise RuntimeError(
+            'Usernames that differ only by case must be renamed first: ' + ', '.join(sorted(clashes))
+        )
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_user_username_lower ON "user" (lower(username))'))
+
+
+def migrate():
+    # New tables (tombstone, ...) first; create_all() skips existing ones
+    db.create_all()
+    with db.engine.begin() as conn:
+        add_change_versions(conn)
+        add_last_write_at(conn)
+        add_username_lower_index(conn)
+
+
+if __name__ == '__main__':
+    with create_app({'AUTO_CREATE_SCHEMA': False}).app_context():
+        migrate()
@@ -1,21 +1,51 @@
+import datetime
+
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
+from money import from_minor, to_minor, to_base_minor
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def _off_event_loop(fn, *args):
+    # Password hashing is ~100ms of CPU. Under the gevent workers that would
+    # stall every request in the worker, so run it on a real thread (hashlib
+    # releases the GIL while hashing)
+    try:
+        from gevent import get_hub
+        from gevent.monkey import is_module_patched
+    except ImportError:
+        return fn(*args)
+    if not is_module_patched('threading'):
+        return fn(*args)
+    return get_hub().threadpool.apply(fn, args)
 
-db = SQLAlchemy()
 
 class User(db.Model):
+    __table_args__ = (
+        # Usernames are unique regardless of case (enforced race-free at signup)
+        db.Index('ix_user_username_lower', db.func.lower(db.text('username')), unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)   # NEW
     password_hash = db.Column(db.String(256), nullable=False)
     reset_token = db.Column(db.String(256), nullable=True)
     reset_token_expiration = db.Column(db.DateTime, nullable=True)
+    # Per-user change counter, bumped on every write (see /api/sync)
+    change_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    # Currency that Transaction.amount_base is expressed in
+    home_currency = db.Column(db.String(10), nullable=False, default='ILS', server_default='ILS')
+    # Unix time of the user's last write; reads stay on the primary for a while after it (replicas.py)
+    last_write_at = db.Column(db.Float, nullable=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = _off_event_loop(generate_password_hash, password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return _off_event_loop(check_password_hash, self.password_hash, password)
 
 # Add a user_id foreign key to Transaction and Category models:
 class Category(db.Model):
@@ -23,14 +53,106 @@ class Category(db.Model):
     name = db.Column(db.String)
     type = db.Column(db.String)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0', index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String, nullable=False)  # 'income' or 'expense'
     category = db.Column(db.String, nullable=False)  # category name or could be foreign key
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)  # minor units of `currency`
+    amount_base = db.Column(db.BigInteger, nullable=False)  # minor units of the user's home currency
     description = db.Column(db.String)
     date = db.Column(db.Date, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     currency = db.Column(db.String(10), nullable=False, server_default='ILS')
     exchange_rate = db.Column(db.Float, nullable=False, server_default='1.0')
+    version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0', index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    @property
+    def amount(self):
+        return from_minor(self.amount_minor, self.currency)
+
+    def set_amount(self, amount, exchange_rate, home_currency):
+        # currency must already be set, it decides the minor unit
+        self.exchange_rate = float(exchange_rate)
+        self.amount_minor = to_minor(amount, self.currency)
+        self.amount_base = to_base_minor(amount, exchange_rate, home_currency)
+
+# Left behind by deletes so that sync clients learn which rows to drop
+class Tombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # 'transaction' or 'category'
+    entity_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# Closed years moved out of `transaction` by archive.py: the raw rows as
+# zlib-compressed JSON, fetched only on demand...
+class ArchivedYear(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# ...and the per-month/category totals analytics reads in their place
+class ArchivedSummary(db.Model):
+    __table_args__ = (db.Index('ix_archived_summary_user_year', 'user_id', 'year'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String, nullable=False)
+    category = db.Column(db.String, nullable=False)
+    total_base = db.Column(db.BigInteger, nullable=False)  # minor units of the home currency
+    tx_count = db.Column(db.Integer, nullable=False)
+
+# Written by the offline insights job (insights.py), served by /api/insights
+class Insight(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'anomaly' or 'mover'
+    month = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    type = db.Column(db.String, nullable=False)
+    category = db.Column(db.String, nullable=False)
+    value = db.Column(db.BigInteger, nullable=False)  # this month, minor units of the home currency
+    baseline = db.Column(db.BigInteger, nullable=False)  # mean of prior months / last month
+    score = db.Column(db.Float, nullable=False)  # z-score / relative change vs. last month
+    computed_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# Change events for the database event broker (see events.py), read by every worker
+class EventLog(db.Model):
+    __table_args__ = (db.Index('ix_event_log_user_version', 'user_id', 'version'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.BigInteger, nullable=False)  # the SSE event id
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.Float, nullable=False)  # unix time
+
+# Token buckets for the shared rate-limit backend (see rate_limit.py)
+class RateLimitBucket(db.Model):
+    key = db.Column(db.String(200), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)  # unix time
+
+
+def bump_change_version(user_id):
+    # Row-locks the user until commit, so versions become visible in order
+    return db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(change_version=User.change_version + 1)
+        .returning(User.change_version)
+    ).scalar_one()
+
+
+def get_home_currency(user_id):
+    return db.session.execute(
+        db.select(User.home_currency).where(User.id == user_id)
+    ).scalar() or 'ILS'
+
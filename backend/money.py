@@ -0,0 +1,26 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# ISO 4217 currencies whose minor unit is not 1/100
+MINOR_UNIT_EXPONENTS = {
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+    'CLP': 0, 'ISK': 0, 'JPY': 0, 'KRW': 0, 'PYG': 0, 'UGX': 0, 'VND': 0,
+}
+
+
+def minor_exponent(currency):
+    return MINOR_UNIT_EXPONENTS.get((currency or 'ILS').upper(), 2)
+
+
+def to_minor(amount, currency):
+    """Decimal amount (str/float/Decimal) -> integer minor units, rounded half-up."""
+    value = Decimal(str(amount)).scaleb(minor_exponent(currency))
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(minor, currency):
+    return float(Decimal(int(minor)).scaleb(-minor_exponent(currency)))
+
+
+def to_base_minor(amount, exchange_rate, home_currency):
+    """Amount converted with exchange_rate, in minor units of home_currency."""
+    return to_minor(Decimal(str(amount)) * Decimal(str(exchange_rate)), home_currency)
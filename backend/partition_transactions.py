@@ -0,0 +1,111 @@
+"""Optional: turn Postgres `transaction` into a table partitioned by year.
+
+Rebuilds the table as ``PARTITION BY RANGE (date)`` with one partition per
+year (transaction_y2024, ...) plus a default partition, copying the rows
+over in one transaction. Postgres then prunes partitions for date-bounded
+queries, and indexes stay per-year. The primary key becomes (id, date), as
+Postgres requires for partitioned tables; ids still come from the same
+sequence, so the ORM keeps using `id` alone. Defaults, NOT NULL/CHECK
+constraints and foreign keys (user_id -> user) carry over. SQLite is left
+unchanged.
+
+    cd backend && python partition_transactions.py            # convert
+    cd backend && python partition_transactions.py --ensure 2 # add partitions 2 years ahead
+"""
+import argparse
+import datetime
+import logging
+
+from sqlalchemy import text
+
+from models import db, Transaction
+
+
+def _partition_sql(year):
+    return (
+        f'CREATE TABLE IF NOT EXISTS transaction_y{year} PARTITION OF "transaction" '
+        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+    )
+
+
+def is_partitioned(conn):
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'transaction')"
+    )).scalar()
+
+
+def ensure_partitions(conn, through_year):
+    """Create yearly partitions up to `through_year`.
+
+    Rows that landed in the default partition for those years must be moved
+    first, so this is meant to run ahead of time (e.g. yearly from cron).
+    """
+    first = conn.execute(text(
+        'SELECT COALESCE(MIN(EXTRACT(YEAR FROM date))::int, :year) FROM "transaction"'
+    ), {'year': datetime.date.today().year}).scalar()
+    for year in range(first, through_year + 1):
+        conn.execute(text(_partition_sql(year)))
+
+
+def partition_transactions(years_ahead=1):
+    if db.engine.dialect.name != 'postgresql':
+        logging.info('Partitioning is Postgres-only; %s left unchanged', db.engine.dialect.name)
+        return False
+
+    with db.engine.begin() as conn:
+        if is_partitioned(conn):
+            ensure_partitions(conn, datetime.date.today().year + years_ahead)
+            return False
+
+        conn.execute(text('LOCK TABLE "transaction" IN ACCESS EXCLUSIVE MODE'))
+        seq = conn.execute(text("SELECT pg_get_serial_sequence('\"transaction\"', 'id')")).scalar()
+        conn.execute(text('ALTER TABLE "transaction" RENAME TO transaction_unpartitioned'))
+        # LIKE never copies foreign keys; keep their definitions to re-add below
+        foreign_keys = conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'transaction_unpartitioned'::regclass AND contype = 'f'"
+        )).all()
+        conn.execute(text(
+            'CREATE TABLE "transaction" (LIKE transaction_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE (date)'
+        ))
+
+        bounds = conn.execute(text(
+            'SELECT MIN(EXTRACT(YEAR FROM date))::int, MAX(EXTRACT(YEAR FROM date))::int '
+            'FROM transaction_unpartitioned'
+        )).one()
+        this_year = datetime.date.today().year
+        first = bounds[0] if bounds[0] is not None else this_year
+        last = max(bounds[1] or this_year, this_year + years_ahead)
+        for year in range(first, last + 1):
+            conn.execute(text(_partition_sql(year)))
+        conn.execute(text('CREATE TABLE transaction_default PARTITION OF "transaction" DEFAULT'))
+
+        conn.execute(text('INSERT INTO "transaction" SELECT * FROM transaction_unpartitioned'))
+        if seq:
+            # The id sequence belongs to the old table; keep it when that is dropped
+            conn.execute(text(f'ALTER SEQUENCE {seq} OWNED BY "transaction".id'))
+        conn.execute(text('DROP TABLE transaction_unpartitioned'))
+
+        # Constraints and indexes go on after the copy, under the names the
+        # drop just freed
+        conn.execute(text('ALTER TABLE "transaction" ADD CONSTRAINT transaction_pkey PRIMARY KEY (id, date)'))
+        for name, definition in foreign_keys:
+            conn.execute(text(f'ALTER TABLE "transaction" ADD CONSTRAINT {name} {definition}'))
+        for index in Transaction.__table__.indexes:
+            index.create(conn)
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_transaction_user_date ON "transaction" (user_id, date)'))
+    return True
+
+
+if __name__ == '__main__':
+    from App import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ensure', type=int, metavar='YEARS', default=1,
+                        help='create partitions this many years past the current one')
+    args = parser.parse_args()
+    with create_app({'AUTO_CREATE_SCHEMA': False}).app_context():
+        if partition_transactions(args.ensure):
+            print('transaction table is now partitioned by year')
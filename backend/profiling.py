@@ -0,0 +1,284 @@
+"""Opt-in request profiling.
+
+Nothing here is hooked into the app unless PROFILE_ADMIN_TOKEN or
+PROFILE_SAMPLE_RATE is set, so the normal request path pays nothing.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_ADMIN_TOKEN>``
+or is picked by PROFILE_SAMPLE_RATE. Each capture writes to PROFILE_DIR:
+
+* ``<name>.collapsed`` - folded stacks ("a;b;c 12"), opens in speedscope
+  or flamegraph.pl (PROFILE_MODE=sample, the default)
+* ``<name>.prof`` - cProfile/pstats dump (PROFILE_MODE=cprofile)
+* ``<name>.json`` - request metadata and per-statement SQL timings
+
+Under the gevent workers every request shares one OS thread, so the
+sampler follows the request's greenlet instead (GreenletSampler), and
+overlapping requests are profiled independently. cProfile's hook is per OS
+thread (per process on 3.12+), so only one cProfile capture runs at a time
+per worker; requests that arrive meanwhile are not profiled, and the one
+that is still sees calls made by other greenlets while it runs.
+"""
+import collections
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from flask import Blueprint, g, has_app_context, jsonify, request, send_from_directory
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+$')
+
+bp = Blueprint('profiling', __name__)
+_config = {}
+_cprofile_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's stack on a timer and folds identical stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._record(sys._current_frames().get(self.thread_id))
+
+    def _record(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class GreenletSampler(StackSampler):
+    """Samples one greenlet's stack from a real OS thread.
+
+    A suspended greenlet (waiting on the database, a lock, ...) exposes its
+    stack as gr_frame; while it runs, gr_frame is None and its stack is the
+    OS thread's current one. A switch between the two checks can misfile
+    the odd sample.
+    """
+
+    def __init__(self, greenlet, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        from gevent.monkey import get_original
+        self.greenlet = greenlet
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._start_new_thread = get_original('_thread', 'start_new_thread')
+        self._sleep = get_original('time', 'sleep')
+        self._done = get_original('_thread', 'allocate_lock')()
+        self._stopped = False
+
+    def start(self):
+        self._done.acquire()
+        self._start_new_thread(self._run, ())
+
+    def stop(self):
+        self._stopped = True
+        # Blocks the worker for at most one interval
+        self._done.acquire()
+        self._done.release()
+
+    def _run(self):
+        try:
+            while True:
+                self._sleep(self.interval)
+                if self._stopped:
+                    return
+                frame = self.greenlet.gr_frame
+                if frame is None and not self.greenlet.dead:
+                    frame = sys._current_frames().get(self.thread_id)
+                    if self.greenlet.gr_frame is not None:
+                        continue  # switched away meanwhile
+                self._record(frame)
+        finally:
+            self._done.release()
+
+
+def _threads_are_greenlets():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+def _wants_profile():
+    return _is_admin() or random.random() < _config['sample_rate']
+
+
+def _start_profile():
+    if not _wants_profile():
+        return
+    if _config['mode'] == 'cprofile':
+        if not _cprofile_lock.acquire(blocking=False):
+            logging.info('Not profiling %s: a cProfile capture is already running', request.path)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (e.g. a debugger) owns the hook
+            _cprofile_lock.release()
+            logging.warning('Not profiling %s: another profiler is active', request.path)
+            return
+    elif _config['greenlets']:
+        import gevent
+        from gevent.monkey import get_original
+        profiler = GreenletSampler(gevent.getcurrent(), get_original('_thread', 'get_ident')())
+        profiler.start()
+    else:
+        profiler = StackSampler(threading.get_ident())
+        profiler.start()
+    g.profile = {'profiler': profiler, 'sql': [], 'started': time.perf_counter()}
+
+
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profiler = profile['profiler']
+    _stop(profiler)
+    duration_ms = (time.perf_counter() - profile['started']) * 1000
+
+    name = '{}-{}-{}'.format(
+        time.strftime('%Y%m%dT%H%M%S'),
+        re.sub(r'[^\w]+', '_', request.endpoint or 'unknown'),
+        g.get('request_id') or os.urandom(4).hex(),
+    )
+    directory = _config['directory']
+    try:
+        os.makedirs(directory, exist_ok=True)
+        if isinstance(profiler, cProfile.Profile):
+            profiler.dump_stats(os.path.join(directory, name + '.prof'))
+        else:
+            with open(os.path.join(directory, name + '.collapsed'), 'w') as f:
+                f.write(profiler.collapsed())
+        with open(os.path.join(directory, name + '.json'), 'w') as f:
+            json.dump({
+                'method': request.method,
+                'path': request.full_path,
+                'status': response.status_code,
+                'user_id': g.get('user_id'),
+                'duration_ms': round(duration_ms, 2),
+                'sql_total_ms': round(sum(q['duration_ms'] for q in profile['sql']), 2),
+                'sql': profile['sql'],
+            }, f, indent=2)
+    except OSError as e:
+        logging.error('Could not write profile %s: %s', name, e)
+        return response
+
+    response.headers['X-Profile-Id'] = name
+    return response
+
+
+def _stop(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        _cprofile_lock.release()
+    else:
+        profiler.stop()
+
+
+def _abandon_profile(exc):
+    # The response never reached _finish_profile; still free the profiler
+    profile = g.pop('profile', None)
+    if profile is not None:
+        _stop(profile['profiler'])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profile_query_start')
+    if not starts:
+        return
+    started = starts.pop()
+    profile = g.get('profile') if has_app_context() else None
+    if profile is not None:
+        profile['sql'].append({
+            'statement': statement,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+        })
+
+
+def _is_admin():
+    token = _config['admin_token']
+    header = request.headers.get('X-Profile')
+    return bool(token and header and hmac.compare_digest(header, token))
+
+
+@bp.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not _is_admin():
+        return jsonify({'message': 'Unauthorized'}), 401
+    directory = _config['directory']
+    if not os.path.isdir(directory):
+        return jsonify([])
+    entries = sorted(os.scandir(directory), key=lambda e: e.stat().st_mtime, reverse=True)
+    return jsonify([{
+        'name': e.name,
+        'size': e.stat().st_size,
+        'modified': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(e.stat().st_mtime)),
+    } for e in entries if e.is_file()])
+
+
+@bp.route('/api/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    if not _is_admin():
+        return jsonify({'message': 'Unauthorized'}), 401
+    directory = os.path.abspath(_config['directory'])
+    if not PROFILE_NAME_RE.match(name) or not os.path.isfile(os.path.join(directory, name)):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_from_directory(directory, name, as_attachment=True)
+
+
+def init_profiling(app):
+    admin_token = os.environ.get('PROFILE_ADMIN_TOKEN')
+    sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    if not admin_token and sample_rate <= 0:
+        return
+
+    mode = os.environ.get('PROFILE_MODE', 'sample')
+    _config.update(
+        admin_token=admin_token,
+        sample_rate=sample_rate,
+        mode=mode,
+        greenlets=_threads_are_greenlets(),
+        directory=os.environ.get('PROFILE_DIR', os.path.join(app.root_path, 'profiles')),
+    )
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.register_blueprint(bp)
@@ -0,0 +1,157 @@
+"""Token-bucket rate limiting for expensive endpoints.
+
+    @bp.route('/api/login', methods=['POST'])
+    @rate_limit('login', capacity=10, per_seconds=60)
+    def login(): ...
+
+A bucket holds ``capacity`` tokens and refills at capacity/per_seconds per
+second; each request takes one. Limits can be overridden per route with
+RATE_LIMITS="login=5/60,check_username=30/10". RATE_LIMIT_BACKEND picks
+where buckets live:
+
+* ``memory`` (default) - per worker process
+* ``database`` - the ``rate_limit_bucket`` table, shared by all workers;
+  each check is a single atomic UPDATE, so it is race-free on Postgres and
+  SQLite alike
+
+Per-IP limits key on request.remote_addr, which create_app() derives from
+the last TRUSTED_PROXY_HOPS X-Forwarded-For entries (the ones our proxy
+added), never from what the client sent. Buckets that have refilled are
+dropped, since a missing bucket means a full one.
+"""
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, make_response, request
+
+from models import db, RateLimitBucket
+
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated_at, time it is full again)
+        self._next_sweep = 0.0
+
+    def take(self, key, capacity, rate, now):
+        """Returns (allowed, tokens left after this request)."""
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            return allowed, tokens
+
+    def _sweep(self, now):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_sweep = now + SWEEP_INTERVAL_SECONDS
+
+
+class DatabaseBackend:
+    def __init__(self):
+        # Rows idle this long are full again for every configured window
+        self.idle_seconds = float(os.environ.get('RATE_LIMIT_IDLE_SECONDS', 3600))
+        self._next_sweep = 0.0
+
+    def take(self, key, capacity, rate, now):
+        bucket = RateLimitBucket.__table__
+        if now >= self._next_sweep:
+            self._next_sweep = now + SWEEP_INTERVAL_SECONDS
+            with db.engine.begin() as conn:
+                conn.execute(db.delete(bucket).where(bucket.c.updated_at < now - self.idle_seconds))
+
+        refilled = bucket.c.tokens + (now - bucket.c.updated_at) * rate
+        refilled = db.case((refilled > capacity, capacity), else_=refilled)
+
+        # Own connection: the limiter must not commit the request's session
+        with db.engine.begin() as conn:
+            tokens = conn.execute(
+                db.update(bucket)
+                .where(bucket.c.key == key, refilled >= 1)
+                .values(tokens=refilled - 1, updated_at=now)
+                .returning(bucket.c.tokens)
+            ).scalar()
+            if tokens is not None:
+                return True, tokens
+
+            if conn.dialect.name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            inserted = conn.execute(
+                insert(bucket)
+                .values(key=key, tokens=capacity - 1, updated_at=now)
+                .on_conflict_do_nothing(index_elements=['key'])
+            ).rowcount
+            if inserted:
+                return True, capacity - 1
+
+            tokens = conn.execute(
+                db.select(refilled).where(bucket.c.key == key)
+            ).scalar() or 0
+            return False, tokens
+
+
+_backend = {}
+
+
+def get_backend():
+    if 'instance' not in _backend:
+        name = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+        _backend['instance'] = DatabaseBackend() if name == 'database' else MemoryBackend()
+    return _backend['instance']
+
+
+def _configured_limit(name, capacity, per_seconds):
+    for item in os.environ.get('RATE_LIMITS', '').split(','):
+        route, sep, spec = item.partition('=')
+        if sep and route.strip() == name:
+            count, _, seconds = spec.partition('/')
+            return int(count), float(seconds or per_seconds)
+    return capacity, per_seconds
+
+
+
+
+def rate_limit(name, capacity, per_seconds, key='ip'):
+    """Limit a view to `capacity` requests per `per_seconds`, per client IP or user.
+
+    key='user' needs g.user_id, so place it below @login_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if os.environ.get('RATE_LIMIT_ENABLED', '1') == '0':
+                return f(*args, **kwargs)
+
+            limit, window = _configured_limit(name, capacity, per_seconds)
+            rate = limit / window
+            client = g.get('user_id') if key == 'user' else request.remote_addr
+            bucket_key = f'{name}:{key}:{client}'
+
+            try:
+                allowed, tokens = get_backend().take(bucket_key, limit, rate, time.time())
+            except Exception as e:
+                # Fail open: a limiter outage must not take the endpoint down
+                logging.error('Rate limiter unavailable: %s', e)
+                return f(*args, **kwargs)
+
+            if allowed:
+                response = make_response(f(*args, **kwargs))
+            else:
+                response = make_response(jsonify({'message': 'Too many requests'}), 429)
+                response.headers['Retry-After'] = str(max(1, int((1 - tokens) / rate + 0.999)))
+            response.headers['X-RateLimit-Limit'] = str(limit)
+            response.headers['X-RateLimit-Remaining'] = str(max(0, int(tokens)))
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,139 @@
+"""Read-replica routing for read-only endpoints.
+
+Set DATABASE_REPLICA_URLS to a comma-separated list of replica URLs. Views
+decorated with @replica_read then run their GET queries against a replica
+(each with its own pool), except when:
+
+* the user wrote within READ_YOUR_WRITES_SECONDS - every write request
+  stores the time in user.last_write_at, in the same transaction as the
+  write, and reads check it on the primary (one primary-key lookup). It is
+  per user, not per browser, so other tabs and devices refetching after an
+  SSE event see the write too;
+* the replica fails - it is skipped for REPLICA_RETRY_SECONDS and the view is
+  re-run on the primary.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class RoutingSession(Session):
+    """Sends statements to g.db_replica when a @replica_read view set one."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            replica = g.get('db_replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaPool:
+    def __init__(self, urls, engine_options, retry_seconds):
+        self.urls = urls
+        self.engine_options = engine_options
+        self.retry_seconds = retry_seconds
+        self._engines = {}
+        self._down_until = {}
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(range(len(urls)))
+
+    def _engine(self, url):
+        engine = self._engines.get(url)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(url)
+                if engine is None:
+                    options = dict(self.engine_options)
+                    if not url.startswith('postgresql'):
+                        options.pop('connect_args', None)
+                    engine = create_engine(url, **options)
+                    self._engines[url] = engine
+        return engine
+
+    def pick(self):
+        """Next healthy replica engine (round-robin), or None."""
+        now = time.monotonic()
+        for _ in range(len(self.urls)):
+            url = self.urls[next(self._cycle)]
+            if self._down_until.get(url, 0) <= now:
+                return self._engine(url)
+        return None
+
+    def mark_down(self, engine):
+        url = next((u for u, e in self._engines.items() if e is engine), None)
+        if url is not None:
+            self._down_until[url] = time.monotonic() + self.retry_seconds
+            logging.warning('Replica %s failed; using primary for %ss', engine.url.host or url, self.retry_seconds)
+
+
+def _pinned_to_primary():
+    from models import db, User
+
+    user_id = g.get('user_id')
+    if user_id is None:
+        return False
+    # Straight from the primary, outside the request session
+    with db.engine.connect() as conn:
+        last_write_at = conn.execute(
+            db.select(User.last_write_at).where(User.id == user_id)
+        ).scalar()
+    return last_write_at is not None and time.time() - last_write_at < current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def replica_read(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        pool = current_app.extensions.get('replicas')
+        if pool is None or request.method != 'GET' or _pinned_to_primary():
+            return f(*args, **kwargs)
+
+        g.db_replica = pool.pick()
+        if g.db_replica is None:
+            return f(*args, **kwargs)
+        session = current_app.extensions['sqlalchemy'].session
+        try:
+            return f(*args, **kwargs)
+        except (OperationalError, InterfaceError):
+            # Reads are safe to repeat; run the view again on the primary
+            session.rollback()
+            pool.mark_down(g.db_replica)
+            g.db_replica = None
+            return f(*args, **kwargs)
+        finally:
+            g.db_replica = None
+    return decorated
+
+
+@event.listens_for(Session, 'before_commit')
+def _record_write(session):
+    # Part of the write's own transaction, so a replica read that sees the
+    # write's SSE event also sees the pin
+    if not (has_request_context() and request.method in WRITE_METHODS):
+        return
+    user_id = g.get('user_id')
+    if user_id is None or 'replicas' not in current_app.extensions or g.get('write_recorded'):
+        return
+    from models import db, User
+    session.execute(db.update(User).where(User.id == user_id).values(last_write_at=time.time()))
+    g.write_recorded = True
+
+
+def init_replicas(app):
+    urls = [u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    if not urls:
+        return
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5)))
+    app.extensions['replicas'] = ReplicaPool(
+        urls, app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}), float(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+    )
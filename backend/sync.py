@@ -0,0 +1,125 @@
+import os
+import queue
+
+from flask import Blueprint, Response, g, jsonify, request
+
+from auth import login_required
+from events import broker, format_sse
+from models import db, User, Transaction, Category, Tombstone
+
+bp = Blueprint('sync', __name__)
+
+
+@bp.route('/api/sync', methods=['GET'])
+@login_required
+def sync():
+    user_id = g.user_id
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid since version'}), 400
+
+    # Read the version first: rows committed meanwhile are returned now and
+    # again on the next pull, which is harmless for an upsert-based client
+    version = db.session.execute(
+        db.select(User.change_version).where(User.id == user_id)
+    ).scalar()
+    if version is None:
+        return jsonify({'message': 'User not found'}), 404
+
+    transactions = Transaction.query.filter(
+        Transaction.user_id == user_id,
+        Transaction.version > since
+    ).order_by(Transaction.version).all()
+    categories = Category.query.filter(
+        Category.user_id == user_id,
+        Category.version > since
+    ).order_by(Category.version).all()
+    tombstones = Tombstone.query.filter(
+        Tombstone.user_id == user_id,
+        Tombstone.version > since
+    ).order_by(Tombstone.version).all()
+
+    deleted = {'transaction': [], 'category': []}
+    for t in tombstones:
+        deleted.setdefault(t.entity, []).append(t.entity_id)
+
+    return jsonify({
+        'version': version,
+        'transactions': [{
+            'id': tx.id,
+            'type': tx.type,
+            'category': tx.category,
+            'amount': tx.amount,
+            'currency': tx.currency or 'ILS',
+            'exchange_rate': tx.exchange_rate or 1.0,
+            'description': tx.description,
+            'date': tx.date.strftime('%Y-%m-%d'),
+            'version': tx.version
+        } for tx in transactions],
+        'categories': [{
+            'id': c.id,
+            'name': c.name,
+            'type': c.type,
+            'version': c.version
+        } for c in categories],
+        'deleted': deleted
+    })
+
+
+SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+
+
+@bp.route('/api/events', methods=['GET'])
+@login_required
+def events():
+    user_id = g.user_id
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    # Subscribe before reading the current version so nothing slips in between
+    q = broker.subscribe(user_id)
+    backlog = []
+    if last_event_id is not None:
+        version = db.session.execute(
+            db.select(User.change_version).where(User.id == user_id)
+        ).scalar() or 0
+        missed = broker.replay(user_id, last_event_id)
+        covered = sorted({e['id'] for e in missed if e['id'] <= version})
+        if covered == list(range(last_event_id + 1, version + 1)):
+            backlog = missed
+        else:
+            # Buffer no longer covers the gap: tell the client to pull /api/sync
+            backlog = [{'id': version, 'entity': 'resync', 'action': 'resync',
+                        'ids': [], 'since': last_event_id, 'version': version}]
+    db.session.remove()
+
+    # Blocks on q.get() for the life of the tab: cheap only because the
+    # gevent workers (gunicorn.conf.py) run this in a greenlet, not a thread
+    def stream():
+        sent = last_event_id or 0
+        try:
+            yield f"retry: {SSE_HEARTBEAT_SECONDS * 1000}\n\n"
+            for evt in backlog:
+                sent = max(sent, evt['id'])
+                yield format_sse(evt)
+            while True:
+                try:
+                    evt = q.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if evt['id'] <= sent:
+                    continue
+                sent = evt['id']
+                yield format_sse(evt)
+        finally:
+            broker.unsubscribe(user_id, q)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from App import create_app  # noqa: E402
+from auth import generate_access_token  # noqa: E402
+from events import broker  # noqa: E402
+from models import db, User  # noqa: E402
+
+SECRET_KEY = 'test-secret-key-that-is-long-enough'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'AUTO_CREATE_SCHEMA': False,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_event_buffers():
+    # User ids restart with every database; so must the replay buffers
+    yield
+    broker._recent.clear()
+
+
+def create_user(app, username='alice'):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def login(app, user_id):
+    """Test client authenticated as user_id via the access_token cookie."""
+    client = app.test_client()
+    with app.app_context():
+        client.set_cookie('access_token', generate_access_token(user_id))
+    return client
+
+
+@pytest.fixture
+def user_id(app):
+    return create_user(app)
+
+
+@pytest.fixture
+def client(app, user_id):
+    return login(app, user_id)
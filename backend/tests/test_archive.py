@@ -0,0 +1,95 @@
+import datetime
+
+import pytest
+
+from archive import archive_closed_years, load_archived_transactions
+from models import db, ArchivedSummary, Transaction, bump_change_version
+
+
+def _add(app, user_id, dates):
+    ids = []
+    with app.app_context():
+        version = bump_change_version(user_id)
+        for i, date in enumerate(dates):
+            tx = Transaction(type='expense', category='Food', description=f'#{i}',
+                             date=date, user_id=user_id, currency='ILS', version=version)
+            tx.set_amount(10 + i, 1.0, 'ILS')
+            db.session.add(tx)
+            db.session.flush()
+            ids.append(tx.id)
+        db.session.commit()
+    return ids
+
+
+def _archive(app, before):
+    with app.app_context():
+        return archive_closed_years(before)
+
+
+@pytest.fixture
+def archived(app, user_id, client):
+    """Two 2023 rows archived, one 2024 row still hot."""
+    old_a, old_b, hot = _add(app, user_id, [
+        datetime.date(2023, 3, 1), datetime.date(2023, 3, 2), datetime.date(2024, 1, 5)
+    ])
+    assert _archive(app, 2024) == 2
+    return old_a, old_b, hot
+
+
+def test_archiving_leaves_tombstones_for_sync_clients(client, archived):
+    old_a, old_b, hot = archived
+
+    pull = client.get('/api/sync?since=1').json
+    assert sorted(pull['deleted']['transaction']) == [old_a, old_b]
+    assert pull['version'] > 1
+    assert [tx['id'] for tx in client.get('/api/sync?since=0').json['transactions']] == [hot]
+
+
+def test_archived_rows_are_served_by_the_archive_endpoint(client, archived):
+    old_a, old_b, _ = archived
+
+    analytics = client.get('/api/analytics').json
+    assert analytics['archivedYears'] == [2023]
+    assert analytics['summary']['2023-03'] == {'income': 0, 'expense': 21.0}
+    assert '2023-03' not in analytics['details']
+    assert [tx['id'] for tx in client.get('/api/archive/2023').json] == [old_a, old_b]
+
+
+def test_editing_an_archived_transaction_restores_it(app, user_id, client, archived):
+    old_a, old_b, _ = archived
+    before = client.get('/api/sync?since=0').json['version']
+
+    response = client.put(f'/api/transactions/{old_a}', json={
+        'type': 'expense', 'category': 'Rent', 'amount': 50, 'date': '2023-03-01'
+    })
+
+    assert response.status_code == 200
+    pull = client.get(f'/api/sync?since={before}').json
+    assert [(tx['id'], tx['category']) for tx in pull['transactions']] == [(old_a, 'Rent')]
+    assert pull['deleted']['transaction'] == []
+    assert [tx['id'] for tx in client.get('/api/archive/2023').json] == [old_b]
+    assert client.get('/api/analytics').json['summary']['2023-03'] == {'income': 0, 'expense': 61.0}
+
+    # The next run archives it again
+    assert _archive(app, 2024) == 1
+    with app.app_context():
+        assert [r['category'] for r in load_archived_transactions(user_id, 2023)] == ['Food', 'Rent']
+
+
+def test_deleting_archived_transactions(app, user_id, client, archived):
+    old_a, old_b, _ = archived
+
+    assert client.delete(f'/api/transactions/{old_a}').status_code == 200
+    response = client.post('/api/transactions/batch', json={'operations': [{'op': 'delete', 'id': old_b}]})
+
+    assert [r['status'] for r in response.json['results']] == ['deleted']
+    assert client.get('/api/archive/2023').json == []
+    assert client.get('/api/analytics').json['archivedYears'] == []
+    with app.app_context():
+        assert ArchivedSummary.query.count() == 0
+        assert Transaction.query.filter(Transaction.id.in_([old_a, old_b])).count() == 0
+    assert sorted(client.get('/api/sync?since=0').json['deleted']['transaction']) == [old_a, old_b]
+
+
+def test_unknown_ids_are_still_not_found(client, archived):
+    assert client.delete('/api/transactions/12345').status_code == 404
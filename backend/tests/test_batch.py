@@ -0,0 +1,89 @@
+import datetime
+
+from events import broker
+from models import db, Transaction
+
+
+def _add(app, user_id, count=3):
+    ids = []
+    with app.app_context():
+        for i in range(count):
+            tx = Transaction(type='expense', category='Food', description=f'#{i}',
+                             date=datetime.date(2024, 5, i + 1), user_id=user_id, currency='ILS')
+            tx.set_amount(10 + i, 1.0, 'ILS')
+            db.session.add(tx)
+            db.session.flush()
+            ids.append(tx.id)
+        db.session.commit()
+    return ids
+
+
+def _rows(app, user_id):
+    with app.app_context():
+        return {tx.id: (tx.category, tx.amount) for tx in Transaction.query.filter_by(user_id=user_id)}
+
+
+def test_batch_applies_mixed_operations(app, user_id, client):
+    a, b, c = _add(app, user_id)
+
+    response = client.post('/api/transactions/batch', json={'operations': [
+        {'op': 'update', 'id': a, 'amount': 99.99},
+        {'op': 'delete', 'id': b},
+        {'op': 'recategorize', 'id': c, 'category': 'Rent'},
+        {'op': 'delete', 'id': 12345},
+    ]})
+
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['updated', 'deleted', 'updated', 'not_found']
+    assert _rows(app, user_id) == {a: ('Food', 99.99), c: ('Rent', 12.0)}
+    assert client.get('/api/sync?since=0').json['deleted']['transaction'] == [b]
+
+
+def test_batch_reports_invalid_items_and_applies_the_rest(app, user_id, client):
+    a, b, c = _add(app, user_id)
+
+    response = client.post('/api/transactions/batch', json={'operations': [
+        {'op': 'update', 'id': a, 'category': None},
+        {'op': 'update', 'id': b},
+        {'op': 'recategorize', 'id': c, 'category': ['Rent']},
+        {'op': 'delete', 'id': True},
+        {'op': 'update', 'id': c, 'description': 'ok'},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [r['status'] for r in results] == ['error', 'error', 'error', 'error', 'error']
+    assert results[0]['error'] == 'category must be a non-empty string'
+    assert results[1]['error'] == 'No fields to update'
+    assert results[3]['error'] == 'Missing transaction id'
+    # c appeared twice: the second op is rejected, the first failed validation
+    assert response.json['version'] is None
+    assert _rows(app, user_id) == {a: ('Food', 10.0), b: ('Food', 11.0), c: ('Food', 12.0)}
+
+
+def test_batch_publishes_one_event_per_version(app, user_id, client):
+    a, b, _ = _add(app, user_id)
+    q = broker.subscribe(user_id)
+    try:
+        response = client.post('/api/transactions/batch', json={'operations': [
+            {'op': 'update', 'id': a, 'amount': 1},
+            {'op': 'delete', 'id': b},
+        ]})
+        evt = q.get_nowait()
+        assert q.empty()
+    finally:
+        broker.unsubscribe(user_id, q)
+
+    version = response.json['version']
+    assert evt['id'] == version
+    assert evt['action'] == 'batch'
+    assert evt['updated'] == [a]
+    assert evt['deleted'] == [b]
+
+    # Resuming from just before the batch replays it instead of forcing a resync
+    assert broker.replay(user_id, version - 1) == [evt]
+    response = client.get('/api/events', headers={'Last-Event-ID': str(version - 1)}, buffered=False)
+    chunks = response.response
+    next(chunks)  # retry:
+    assert next(chunks).startswith(f'id: {version}\nevent: transaction\n'.encode())
+    response.close()
@@ -0,0 +1,42 @@
+import json
+import time
+
+from events import DatabaseEventBroker, EventBroker
+from models import db, EventLog
+
+
+def _insert(log_id, user_id, version):
+    db.session.add(EventLog(id=log_id, user_id=user_id, version=version, created_at=time.time(),
+                            payload=json.dumps({'id': version, 'entity': 'transaction'})))
+    db.session.commit()
+
+
+def test_writes_are_stored_and_replayed(app, user_id, client):
+    broker = DatabaseEventBroker()
+    with app.app_context():
+        broker.stage(db.session)  # nothing pending
+        db.session.info['pending_events'] = [(user_id, {'id': 1, 'entity': 'transaction'})]
+        broker.stage(db.session)
+        db.session.commit()
+
+        assert 'pending_events' not in db.session.info
+        assert [e['id'] for e in broker.replay(user_id, 0)] == [1]
+        assert broker.replay(user_id, 1) == []
+
+
+def test_poll_picks_up_ids_that_commit_out_of_order(app, user_id):
+    broker = DatabaseEventBroker()
+    with app.app_context():
+        # Poll by hand instead of starting the listener thread
+        q = EventBroker.subscribe(broker, user_id)
+        broker._last_id = 9
+        _insert(11, user_id, 2)  # committed before id 10
+        with db.engine.connect() as conn:
+            broker._poll(conn)
+        _insert(10, user_id, 1)
+        with db.engine.connect() as conn:
+            broker._poll(conn)
+            broker._poll(conn)  # delivered once
+
+    assert [q.get_nowait()['id'] for _ in range(q.qsize())] == [2, 1]
+    assert broker._gaps == {}
@@ -0,0 +1,170 @@
+"""Fan-out of changes to 1,000 idle /api/events streams on a real server.
+
+Runs gunicorn with the production config (gevent workers, events shared
+through the database) against a SQLite file, with one and with two workers,
+so it is skipped where gevent/gunicorn are not installed.
+"""
+import http.client
+import os
+import resource
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from auth import generate_access_token
+from conftest import SECRET_KEY
+
+pytest.importorskip('gevent')
+pytest.importorskip('gunicorn')
+pytest.importorskip('psycogreen')
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STREAMS = 1000
+POSTS = 6
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(port, method, path, token=None, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Cookie'] = f'access_token={token}'
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+@pytest.fixture(params=[1, 2], ids=['1-worker', '2-workers'])
+def server(request, app, tmp_path):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=app.config['SQLALCHEMY_DATABASE_URI'],
+        SECRET_KEY=SECRET_KEY,
+        AUTO_CREATE_SCHEMA='0',
+        LOG_LEVEL='WARNING',
+        # Closed streams are noticed on the next heartbeat; keep shutdown quick
+        SSE_HEARTBEAT_SECONDS='1',
+    )
+    env.pop('EVENTS_REDIS_URL', None)
+    env.pop('EVENTS_BROKER', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'App:create_app()',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(request.param)],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=open(tmp_path / 'gunicorn.log', 'w'),
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                if _request(port, 'GET', '/api/health') == 200:
+                    break
+            except OSError:
+                pass
+            assert process.poll() is None and time.monotonic() < deadline, \
+                (tmp_path / 'gunicorn.log').read_text()
+            time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(15)
+
+
+def _read_until(selector, buffers, marker, timeout):
+    """Read from every registered socket until each buffer contains marker."""
+    pending = {key.fileobj for key in selector.get_map().values() if marker not in buffers[key.fileobj]}
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            chunk = key.fileobj.recv(65536)
+            assert chunk, 'stream closed by server'
+            buffers[key.fileobj] += chunk
+            if marker in buffers[key.fileobj]:
+                pending.discard(key.fileobj)
+    return len(buffers) - len(pending)
+
+
+def test_fanout_to_idle_streams(app, user_id, server):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < STREAMS + 100:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, STREAMS * 2 + 100), hard))
+    with app.app_context():
+        token = generate_access_token(user_id)
+    request = (
+        f'GET /api/events HTTP/1.1\r\nHost: localhost\r\nCookie: access_token={token}\r\n\r\n'
+    ).encode()
+
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    try:
+        for _ in range(STREAMS):
+            sock = socket.create_connection(('127.0.0.1', server))
+            sock.sendall(request)
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            buffers[sock] = b''
+
+        # The retry: line is sent after the stream has subscribed
+        assert _read_until(selector, buffers, b'retry:', timeout=30) == STREAMS
+
+        # One worker holding 1,000 idle streams still serves other requests
+        started = time.perf_counter()
+        assert _request(server, 'GET', '/api/health') == 200
+        assert time.perf_counter() - started < 1
+
+        # Each POST lands on either worker; every stream must get all of them
+        body = '{"type": "expense", "category": "Food", "amount": 12.5, "date": "2024-05-01"}'
+        for _ in range(POSTS):
+            assert _request(server, 'POST', '/api/transactions', token, body) == 201
+
+        assert _read_until(selector, buffers, f'id: {POSTS}\n'.encode(), timeout=30) == STREAMS
+        for data in buffers.values():
+            assert [int(line[4:]) for line in data.split(b'\n') if line.startswith(b'id: ')] == \
+                list(range(1, POSTS + 1))
+
+        # Resuming replays the missed events, whichever worker takes the reconnect
+        with socket.create_connection(('127.0.0.1', server)) as sock:
+            sock.sendall(request.replace(b'\r\n\r\n', b'\r\nLast-Event-ID: 3\r\n\r\n'))
+            sock.settimeout(10)
+            data = b''
+            while f'id: {POSTS}\n'.encode() not in data:
+                chunk = sock.recv(65536)
+                assert chunk, 'stream closed by server'
+                data += chunk
+        assert [int(line[4:]) for line in data.split(b'\n') if line.startswith(b'id: ')] == [4, 5, 6]
+    finally:
+        for sock in buffers:
+            selector.unregister(sock)
+            sock.close()
+        selector.close()
+
+
+def test_password_hashing_does_not_stall_the_worker(user_id, server):
+    # scrypt takes ~100ms of CPU per login; other requests must not queue behind it
+    body = '{"username": "alice", "password": "password"}'
+    statuses = []
+    logins = [threading.Thread(target=lambda: statuses.append(_request(server, 'POST', '/api/login', None, body)))
+              for _ in range(4)]
+    for t in logins:
+        t.start()
+    slowest = 0.0
+    while any(t.is_alive() for t in logins):
+        started = time.perf_counter()
+        assert _request(server, 'GET', '/api/health') == 200
+        slowest = max(slowest, time.perf_counter() - started)
+    for t in logins:
+        t.join()
+    assert statuses == [200] * 4
+    assert slowest < 0.1  # one hash alone takes longer
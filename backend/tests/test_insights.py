@@ -0,0 +1,105 @@
+import datetime
+
+import numpy as np
+
+from conftest import create_user
+from insights import (
+    ANOMALY_Z, _month_index, compute_insights, last_complete_month, run_insights_job, score_series,
+)
+from models import db, ArchivedSummary, Transaction
+
+TARGET = datetime.date(2024, 3, 1)
+FOOD_HISTORY = [100, 110, 90, 105, 95, 100, 110, 90, 105, 95, 100, 100]  # 2023-03 .. 2024-02
+
+
+def _months_before(date, n):
+    idx = _month_index(date) - n
+    return idx // 12, idx % 12 + 1
+
+
+def _spend(user_id, category, year, month, amount, archived):
+    if archived:
+        db.session.add(ArchivedSummary(user_id=user_id, year=year, month=month, type='expense',
+                                       category=category, total_base=amount * 100, tx_count=1))
+    else:
+        tx = Transaction(type='expense', category=category, date=datetime.date(year, month, 10),
+                         user_id=user_id, currency='ILS')
+        tx.set_amount(amount, 1.0, 'ILS')
+        db.session.add(tx)
+
+
+def _seed(app, user_id, target_spend):
+    """Twelve months of history, 2023 archived and 2024 hot, then the target month."""
+    with app.app_context():
+        for back, amount in zip(range(12, 0, -1), FOOD_HISTORY):
+            year, month = _months_before(TARGET, back)
+            _spend(user_id, 'Food', year, month, amount, archived=year == 2023)
+            for category, base in (('Rent', 1000), ('Fun', 200), ('Gym', 50), ('Books', 30)):
+                _spend(user_id, category, year, month, base, archived=year == 2023)
+        for category, amount in target_spend.items():
+            _spend(user_id, category, TARGET.year, TARGET.month, amount, archived=False)
+        db.session.commit()
+
+
+def test_score_series():
+    steady = [100, 110, 90, 100] * 3
+    matrix = np.array([
+        steady + [400],  # spike
+        steady + [0],    # nothing yet this month
+        [0] * 10 + [50, 50, 500],  # too little history to score
+    ], dtype=np.int64)
+
+    mean, z, previous, delta, relative = score_series(matrix)
+
+    assert mean[0] == 100
+    assert z[0] > ANOMALY_Z
+    assert z[1] < -ANOMALY_Z
+    assert z[2] == 0
+    assert list(previous) == [100, 100, 50]
+    assert list(delta) == [300, -100, 450]
+    assert list(relative) == [3.0, -1.0, 9.0]
+
+
+def test_compute_insights_flags_spikes_and_top_movers(app, user_id):
+    _seed(app, user_id, {'Food': 300, 'Rent': 1050, 'Fun': 120, 'Gym': 60, 'Books': 35})
+
+    with app.app_context():
+        insights = compute_insights([user_id], _month_index(TARGET))
+
+    anomalies = [(i['category'], i['value'], i['baseline']) for i in insights if i['kind'] == 'anomaly']
+    # The baseline mixes archived (2023) and hot (2024) months
+    assert anomalies == [('Food', 30000, 10000)]
+    movers = [(i['category'], i['value'] - i['baseline']) for i in insights if i['kind'] == 'mover']
+    assert movers == [('Food', 20000), ('Fun', -8000), ('Rent', 5000)]
+
+
+def test_an_empty_month_is_not_unusual_spend(app, user_id):
+    _seed(app, user_id, {})
+
+    with app.app_context():
+        insights = compute_insights([user_id], _month_index(TARGET))
+
+    assert [i for i in insights if i['kind'] == 'anomaly'] == []
+    assert {i['category'] for i in insights if i['kind'] == 'mover'} == {'Rent', 'Fun', 'Food'}
+
+
+def test_default_month_is_the_last_complete_one():
+    assert last_complete_month(datetime.date(2024, 1, 1)) == _month_index(datetime.date(2023, 12, 1))
+    assert last_complete_month(datetime.date(2024, 3, 31)) == _month_index(datetime.date(2024, 2, 1))
+
+
+def test_job_results_are_served_per_user(app, user_id, client):
+    other = create_user(app, 'bob')
+    _seed(app, user_id, {'Food': 300})
+    _seed(app, other, {'Food': 100})
+
+    with app.app_context():
+        users, written, _ = run_insights_job(TARGET, chunk_size=1, workers=1)
+    assert users == 2 and written > 0
+
+    insights = client.get('/api/insights').json
+    assert insights[0]['kind'] == 'anomaly'
+    assert (insights[0]['category'], insights[0]['value'], insights[0]['baseline']) == ('Food', 300.0, 100.0)
+    assert insights[0]['month'] == '2024-03'
+    assert {i['kind'] for i in insights} == {'anomaly', 'mover'}
+    assert app.test_client().get('/api/insights').status_code == 401
@@ -0,0 +1,62 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+import logging_config
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """A fresh logging setup writing to a buffer, restored afterwards."""
+    out = io.StringIO()
+    stream = logging.StreamHandler(out)
+    stream.setFormatter(logging_config.JsonFormatter())
+    root = logging.getLogger()
+    saved = list(root.handlers)
+    monkeypatch.setattr(logging_config, '_state', {
+        'queue': queue.SimpleQueue(),
+        'handlers': [stream],
+        'queue_handler': None,
+        'listener': None,
+        'deferred': False,
+    })
+    logging_config._state['queue_handler'] = logging_config.DeferredQueueHandler(logging_config._state['queue'])
+    yield out
+    logging_config.stop_listener()
+    logging_config._use_handlers(*saved)
+
+
+def _messages(out):
+    return [json.loads(line)['message'] for line in out.getvalue().splitlines()]
+
+
+def test_stop_flushes_without_waiting_for_the_listener(state):
+    logging_config.start_listener()
+    listener = logging_config._state['listener']
+    listener.stop()  # stands in for a listener that never runs again (gevent at exit)
+    logging_config._state['listener'] = listener
+
+    logging.getLogger('t').warning('queued %d', 1)
+    logging.getLogger('t').warning('queued %d', 2)
+    logging_config.stop_listener()
+    logging.getLogger('t').warning('after stop')
+
+    assert _messages(state) == ['queued 1', 'queued 2', 'after stop']
+    assert logging_config._state['listener'] is None
+
+
+def test_deferred_processes_write_directly_until_started(state):
+    logging_config.defer_listener()
+    logging_config._use_handlers(*logging_config._state['handlers'])
+
+    logging.getLogger('t').warning('before fork')
+    assert logging_config._state['listener'] is None
+    assert _messages(state) == ['before fork']
+
+    logging_config.start_listener()
+    logging.getLogger('t').warning('in worker')
+    logging_config.stop_listener()
+    assert _messages(state) == ['before fork', 'in worker']
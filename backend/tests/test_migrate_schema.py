@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from migrate_schema import migrate
+
+from conftest import login
+
+
+def _downgrade_to_unversioned(app, user_id):
+    """Recreate the pre-sync schema: drop the version columns, keep a row."""
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(text(
+            'INSERT INTO "transaction" (type, category, amount_minor, amount_base, date, user_id, currency, exchange_rate) '
+            "VALUES ('expense', 'Food', 1250, 1250, :date, :user_id, 'ILS', 1.0)"
+        ), {'date': datetime.date(2024, 5, 1), 'user_id': user_id})
+        for table in ('transaction', 'category'):
+            conn.execute(text(f'DROP INDEX ix_{table}_version'))
+            conn.execute(text(f'ALTER TABLE "{table}" DROP COLUMN version'))
+            conn.execute(text(f'ALTER TABLE "{table}" DROP COLUMN updated_at'))
+        conn.execute(text('ALTER TABLE "user" DROP COLUMN change_version'))
+        conn.execute(text('ALTER TABLE "user" DROP COLUMN last_write_at'))
+
+
+def test_migrate_adds_versions_and_backfills(app, user_id):
+    _downgrade_to_unversioned(app, user_id)
+
+    with app.app_context():
+        migrate()
+        migrate()  # idempotent
+        columns = {c['name'] for c in inspect(db.engine).get_columns('transaction')}
+        indexes = {i['name'] for i in inspect(db.engine).get_indexes('transaction')}
+        user_columns = {c['name'] for c in inspect(db.engine).get_columns('user')}
+    assert {'version', 'updated_at'} <= columns
+    assert {'change_version', 'last_write_at'} <= user_columns
+    assert 'ix_transaction_version' in indexes
+
+    client = login(app, user_id)
+    data = client.get('/api/sync?since=0').json
+    assert data['version'] == 1
+    assert [tx['amount'] for tx in data['transactions']] == [12.5]
+
+    client.post('/api/transactions', json={
+        'type': 'income', 'category': 'Salary', 'amount': 100, 'date': '2024-05-02'
+    })
+    data = client.get('/api/sync?since=1').json
+    assert data['version'] == 2
+    assert [tx['category'] for tx in data['transactions']] == ['Salary']
+
+
+def test_migrate_adds_case_insensitive_username_index(app, user_id):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ix_user_username_lower'))
+            conn.execute(text(
+                "INSERT INTO \"user\" (username, email, password_hash) VALUES ('ALICE', 'A@example.com', 'x')"
+            ))
+        with pytest.raises(RuntimeError, match='alice'):
+            migrate()
+
+        with db.engine.begin() as conn:
+            conn.execute(text("UPDATE \"user\" SET username = 'alice-2' WHERE username = 'ALICE'"))
+        migrate()
+        with pytest.raises(IntegrityError), db.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO \"user\" (username, email, password_hash) VALUES ('Alice-2', 'B@example.com', 'x')"
+            ))
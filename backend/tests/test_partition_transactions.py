@@ -0,0 +1,86 @@
+import datetime
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from App import create_app
+from conftest import SECRET_KEY, create_user, login
+from models import db, Transaction
+from partition_transactions import is_partitioned, partition_transactions
+
+# The conversion is Postgres-only; point this at a scratch database, it is emptied
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def pg_app():
+    if not POSTGRES_URL:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': POSTGRES_URL,
+        'AUTO_CREATE_SCHEMA': False,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+def _add(user_id, *dates):
+    for date in dates:
+        tx = Transaction(type='expense', category='Food', date=date, user_id=user_id, currency='ILS')
+        tx.set_amount(10, 1.0, 'ILS')
+        db.session.add(tx)
+    db.session.commit()
+
+
+def test_sqlite_is_left_unchanged(app):
+    with app.app_context():
+        assert partition_transactions() is False
+
+
+def test_partitioning_keeps_rows_constraints_and_the_api_working(pg_app):
+    user_id = create_user(pg_app)
+    with pg_app.app_context():
+        _add(user_id, datetime.date(2022, 5, 1), datetime.date(2023, 6, 1))
+
+        assert partition_transactions() is True
+        assert partition_transactions() is False
+        with db.engine.connect() as conn:
+            assert is_partitioned(conn)
+            constraints = dict(conn.execute(text(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = '\"transaction\"'::regclass"
+            )).all())
+        assert constraints['transaction_pkey'] == 'PRIMARY KEY (id, date)'
+        assert constraints['transaction_user_id_fkey'] == 'FOREIGN KEY (user_id) REFERENCES "user"(id)'
+        assert Transaction.query.count() == 2
+
+        with pytest.raises(IntegrityError):
+            _add(user_id + 1, datetime.date(2023, 1, 1))
+        db.session.rollback()
+
+    client = login(pg_app, user_id)
+    assert client.post('/api/transactions', json={
+        'type': 'income', 'category': 'Salary', 'amount': 100, 'date': '2024-02-01'
+    }).status_code == 201
+    with pg_app.app_context():
+        moved = Transaction.query.filter_by(date=datetime.date(2022, 5, 1)).one().id
+    # Changing the year moves the row to another partition
+    assert client.put(f'/api/transactions/{moved}', json={
+        'type': 'expense', 'category': 'Food', 'amount': 12, 'date': '2024-03-01'
+    }).status_code == 200
+    summary = client.get('/api/analytics').json['summary']
+    assert summary == {
+        '2023-06': {'income': 0, 'expense': 10.0},
+        '2024-02': {'income': 100.0, 'expense': 0},
+        '2024-03': {'income': 0, 'expense': 12.0},
+    }
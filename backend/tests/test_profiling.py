@@ -0,0 +1,161 @@
+import json
+import os
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import profiling
+from App import create_app
+from conftest import SECRET_KEY
+from models import db
+
+TOKEN = 'profile-admin-token'
+
+
+def _busy(seconds):
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    for name in ('PROFILE_ADMIN_TOKEN', 'PROFILE_SAMPLE_RATE', 'PROFILE_MODE'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path / 'profiles'))
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        app = create_app({
+            'TESTING': True,
+            'SECRET_KEY': SECRET_KEY,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+            'AUTO_CREATE_SCHEMA': False,
+        })
+
+        @app.route('/slow')
+        def slow():
+            db.session.execute(db.text('SELECT 1'))
+            _busy(0.05)
+            return {'ok': True}
+        return app
+
+    yield make
+    profiling._config.clear()
+    for name in ('before_cursor_execute', 'after_cursor_execute'):
+        listener = getattr(profiling, f'_{name}')
+        if event.contains(Engine, name, listener):
+            event.remove(Engine, name, listener)
+
+
+def _files(app):
+    directory = profiling._config['directory']
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_nothing_is_hooked_when_profiling_is_off(make_app):
+    app = make_app()
+
+    assert profiling._start_profile not in app.before_request_funcs.get(None, [])
+    assert profiling._finish_profile not in app.after_request_funcs.get(None, [])
+    assert 'profiling' not in app.blueprints
+    assert not event.contains(Engine, 'before_cursor_execute', profiling._before_cursor_execute)
+    assert 'profiling.list_profiles' not in app.view_functions
+
+
+def test_only_the_admin_header_triggers_a_capture(make_app):
+    app = make_app(PROFILE_ADMIN_TOKEN=TOKEN)
+    client = app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/slow').headers
+    assert 'X-Profile-Id' not in client.get('/slow', headers={'X-Profile': 'wrong'}).headers
+    assert _files(app) == []
+
+    name = client.get('/slow', headers={'X-Profile': TOKEN}).headers['X-Profile-Id']
+    assert _files(app) == [name + '.collapsed', name + '.json']
+    directory = profiling._config['directory']
+    with open(os.path.join(directory, name + '.collapsed')) as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any(';slow (test_profiling.py' in line and ';_busy (' in line for line in lines)
+    with open(os.path.join(directory, name + '.json')) as f:
+        meta = json.load(f)
+    assert (meta['method'], meta['path'], meta['status']) == ('GET', '/slow?', 200)
+    assert [q['statement'] for q in meta['sql']] == ['SELECT 1']
+    assert meta['duration_ms'] >= 50
+
+
+def test_sampled_requests_are_captured_without_the_header(make_app):
+    app = make_app(PROFILE_SAMPLE_RATE='1')
+
+    assert 'X-Profile-Id' in app.test_client().get('/slow').headers
+    # Without an admin token nobody can list or download them
+    assert app.test_client().get('/api/admin/profiles').status_code == 401
+
+
+def test_list_and_download(make_app):
+    app = make_app(PROFILE_ADMIN_TOKEN=TOKEN)
+    client = app.test_client()
+    admin = {'X-Profile': TOKEN}
+    name = client.get('/slow', headers=admin).headers['X-Profile-Id']
+
+    assert client.get('/api/admin/profiles').status_code == 401
+    assert client.get(f'/api/admin/profiles/{name}.json').status_code == 401
+    listed = client.get('/api/admin/profiles', headers=admin).json
+    assert sorted(p['name'] for p in listed) == [name + '.collapsed', name + '.json']
+
+    response = client.get(f'/api/admin/profiles/{name}.collapsed', headers=admin)
+    assert response.status_code == 200
+    assert b'_busy' in response.data
+    assert client.get('/api/admin/profiles/missing.json', headers=admin).status_code == 404
+    assert client.get('/api/admin/profiles/..', headers=admin).status_code == 404
+
+
+def test_one_cprofile_capture_at_a_time(make_app):
+    app = make_app(PROFILE_ADMIN_TOKEN=TOKEN, PROFILE_MODE='cprofile')
+    client = app.test_client()
+    admin = {'X-Profile': TOKEN}
+
+    # Another request's capture is running: this one is served, not profiled
+    with profiling._cprofile_lock:
+        response = client.get('/slow', headers=admin)
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+    name = client.get('/slow', headers=admin).headers['X-Profile-Id']
+    assert _files(app) == [name + '.json', name + '.prof']
+    assert not profiling._cprofile_lock.locked()
+
+
+def test_greenlet_sampler_only_sees_its_greenlet():
+    gevent = pytest.importorskip('gevent')
+    from gevent.monkey import get_original
+
+    def spin(seconds):
+        until = time.perf_counter() + seconds
+        while time.perf_counter() < until:
+            _busy(0.002)
+            gevent.sleep(0)  # let the other greenlet run
+
+    def request_a():
+        spin(0.2)
+
+    def request_b():
+        spin(0.2)
+
+    a, b = gevent.spawn(request_a), gevent.spawn(request_b)
+    thread_id = get_original('_thread', 'get_ident')()
+    samplers = [profiling.GreenletSampler(a, thread_id), profiling.GreenletSampler(b, thread_id)]
+    for sampler in samplers:
+        sampler.start()
+    gevent.joinall([a, b])
+    for sampler in samplers:
+        sampler.stop()
+
+    folded_a, folded_b = samplers[0].collapsed(), samplers[1].collapsed()
+    assert 'request_a' in folded_a and 'request_b' in folded_b
+    # A switch between the two checks can misfile the odd sample, no more
+    assert folded_a.count('request_b') <= 2 and folded_b.count('request_a') <= 2
@@ -0,0 +1,57 @@
+import pytest
+
+import rate_limit
+from models import db, RateLimitBucket
+
+LOGIN = {'username': 'nobody', 'password': 'wrong'}
+
+
+@pytest.fixture(params=['memory', 'database'])
+def backend(request, monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_BACKEND', request.param)
+    monkeypatch.setattr(rate_limit, '_backend', {})
+    return request.param
+
+
+def _login(client, forwarded_for):
+    # What the hosting proxy forwards: whatever the client sent, then the
+    # address it actually connected from
+    return client.post('/api/login', json=LOGIN, headers={'X-Forwarded-For': forwarded_for})
+
+
+def test_spoofed_forwarded_for_does_not_escape_the_limit(app, backend):
+    client = app.test_client()
+    statuses = [_login(client, f'10.0.0.{i}, 203.0.113.7').status_code for i in range(12)]
+
+    assert statuses == [401] * 10 + [429] * 2
+
+    # Another real client is unaffected
+    response = _login(client, '10.0.0.1, 198.51.100.2')
+    assert response.status_code == 401
+    assert response.headers['X-RateLimit-Remaining'] == '9'
+
+
+def test_memory_backend_drops_refilled_buckets():
+    backend = rate_limit.MemoryBackend()
+    for i in range(100):
+        backend.take(f'ip:{i}', capacity=10, rate=1.0, now=1000.0)
+    backend.take('busy', capacity=10, rate=0.01, now=1000.0)
+
+    backend.take('late', capacity=10, rate=1.0, now=1000.0 + rate_limit.SWEEP_INTERVAL_SECONDS)
+
+    # ip:* refilled after 1s; 'busy' needs 100s, 'late' was just used
+    assert set(backend._buckets) == {'busy', 'late'}
+
+
+def test_database_backend_drops_idle_rows(app, monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_IDLE_SECONDS', '100')
+    backend = rate_limit.DatabaseBackend()
+    with app.app_context():
+        for i in range(5):
+            backend.take(f'ip:{i}', capacity=10, rate=1.0, now=1000.0)
+        backend.take('recent', capacity=10, rate=1.0, now=1080.0)
+
+        backend.take('late', capacity=10, rate=1.0, now=1000.0 + 101 + rate_limit.SWEEP_INTERVAL_SECONDS)
+
+        keys = db.session.execute(db.select(RateLimitBucket.key)).scalars().all()
+    assert sorted(keys) == ['late', 'recent']
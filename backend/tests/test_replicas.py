@@ -0,0 +1,67 @@
+import shutil
+import time
+
+import pytest
+
+from App import create_app
+from conftest import SECRET_KEY, create_user, login
+from models import db
+
+
+@pytest.fixture
+def replicated(tmp_path, monkeypatch):
+    """An app whose only replica is a snapshot that never catches up."""
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', f'sqlite:///{replica}')
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'AUTO_CREATE_SCHEMA': False,
+        'READ_YOUR_WRITES_SECONDS': 0.5,
+    })
+    with app.app_context():
+        db.create_all()
+    users = create_user(app, 'alice'), create_user(app, 'bob')
+    shutil.copy(primary, replica)
+    yield app, users
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    for engine in app.extensions['replicas']._engines.values():
+        engine.dispose()
+
+
+def _months(client):
+    return sorted(client.get('/api/analytics').json['summary'])
+
+
+def test_a_write_pins_every_session_of_that_user(replicated):
+    app, (alice, bob) = replicated
+    laptop, phone, other = login(app, alice), login(app, alice), login(app, bob)
+
+    assert laptop.post('/api/transactions', json={
+        'type': 'expense', 'category': 'Food', 'amount': 5, 'date': '2024-05-01'
+    }).status_code == 201
+
+    # The phone never wrote and has no cookie from the laptop; it still
+    # reads the primary, e.g. when refetching after the SSE event
+    assert _months(phone) == ['2024-05']
+    assert _months(laptop) == ['2024-05']
+    # Other users keep reading the (stale) replica
+    assert _months(other) == []
+
+    time.sleep(0.6)
+    assert _months(phone) == []
+
+
+def test_reads_without_writes_use_the_replica(replicated):
+    app, (alice, _) = replicated
+    with app.app_context():
+        db.session.execute(db.text(
+            'INSERT INTO "transaction" (type, category, amount_minor, amount_base, date, user_id, currency, '
+            "exchange_rate, version) VALUES ('expense', 'Food', 100, 100, '2024-05-01', :user, 'ILS', 1.0, 1)"
+        ), {'user': alice})
+        db.session.commit()
+
+    assert _months(login(app, alice)) == []
@@ -0,0 +1,155 @@
+"""/api/analytics/trends checked against a naive Python reference."""
+import datetime
+import os
+import random
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from App import create_app
+from conftest import SECRET_KEY, create_user, login
+from models import db, Transaction
+
+START = datetime.date(2021, 1, 1)
+MONTHS = 48
+# Also run against Postgres when pointed at a scratch database; it is emptied
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def any_app(request):
+    if request.param == 'sqlite':
+        yield request.getfixturevalue('app')
+        return
+    if not POSTGRES_URL:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': POSTGRES_URL,
+        'AUTO_CREATE_SCHEMA': False,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+def _month_index(date):
+    return date.year * 12 + date.month - 1
+
+
+def _seed(app, user_id, count=600, seed=1):
+    rnd = random.Random(seed)
+    rows = []
+    with app.app_context():
+        for _ in range(count):
+            offset = rnd.randrange(MONTHS)
+            row = {
+                'type': rnd.choice(['income', 'expense']),
+                'category': rnd.choice(['Food', 'Rent', 'Salary', 'Fun']),
+                'amount': f'{rnd.uniform(1, 500):.2f}',
+                'exchange_rate': rnd.choice(['1.0', '3.71']),
+                'date': datetime.date(START.year + (START.month - 1 + offset) // 12,
+                                      (START.month - 1 + offset) % 12 + 1, rnd.randint(1, 28)),
+            }
+            # Leave a gap in one series so the dense calendar is exercised
+            if row['category'] == 'Fun' and 20 <= offset < 26:
+                continue
+            rows.append(row)
+            tx = Transaction(type=row['type'], category=row['category'], date=row['date'],
+                             user_id=user_id, currency='ILS')
+            tx.set_amount(row['amount'], row['exchange_rate'], 'ILS')
+            db.session.add(tx)
+        db.session.commit()
+    return rows
+
+
+def _reference(rows):
+    """Month by month, one series at a time, in agorot."""
+    monthly = defaultdict(int)
+    for row in rows:
+        base = (Decimal(row['amount']) * Decimal(row['exchange_rate']) * 100).quantize(
+            Decimal(1), rounding=ROUND_HALF_UP)
+        monthly[(row['type'], row['category'], _month_index(row['date']))] += int(base)
+
+    first = min(m for _, _, m in monthly)
+    last = max(m for _, _, m in monthly)
+    trends = {}
+    for type_, category in {(t, c) for t, c, _ in monthly}:
+        totals = [monthly.get((type_, category, m), 0) for m in range(first, last + 1)]
+        points = []
+        for i, total in enumerate(totals):
+            last3 = totals[max(0, i - 2):i + 1]
+            last12 = totals[max(0, i - 11):i + 1]
+            points.append({
+                'total': total / 100,
+                'avg3': sum(last3) / len(last3) / 100,
+                'avg12': sum(last12) / len(last12) / 100,
+                'yoy': None if i < 12 else (total - totals[i - 12]) / 100,
+            })
+        trends.setdefault(type_, {})[category] = points
+
+    balance = []
+    running = 0
+    for m in range(first, last + 1):
+        net = sum(
+            v if t == 'income' else -v
+            for (t, _, month), v in monthly.items() if month == m
+        )
+        running += net
+        balance.append({'month': f'{m // 12:04d}-{m % 12 + 1:02d}', 'net': net / 100, 'balance': running / 100})
+    return trends, balance
+
+
+def _assert_matches(data, rows):
+    trends, balance = _reference(rows)
+    assert data['runningBalance'] == [
+        {'month': b['month'], 'net': pytest.approx(b['net']), 'balance': pytest.approx(b['balance'])}
+        for b in balance
+    ]
+    for type_, by_category in trends.items():
+        assert set(data['categoryTrends'][type_]) == set(by_category)
+        for category, expected in by_category.items():
+            got = data['categoryTrends'][type_][category]
+            assert len(got) == len(expected) == len(balance)
+            for g, e in zip(got, expected):
+                assert g['total'] == pytest.approx(e['total'])
+                assert g['avg3'] == pytest.approx(e['avg3'])
+                assert g['avg12'] == pytest.approx(e['avg12'])
+                if e['yoy'] is None:
+                    assert g['yoy'] is None
+                else:
+                    assert g['yoy'] == pytest.approx(e['yoy'])
+
+
+def test_trends_match_reference(any_app):
+    user_id = create_user(any_app)
+    rows = _seed(any_app, user_id)
+
+    response = login(any_app, user_id).get('/api/analytics/trends')
+
+    assert response.status_code == 200
+    assert len(response.json['runningBalance']) == MONTHS
+    _assert_matches(response.json, rows)
+
+
+def test_trends_category_filter(app, user_id, client):
+    rows = _seed(app, user_id, seed=2)
+
+    response = client.get('/api/analytics/trends?categories=Food,Fun')
+
+    assert response.status_code == 200
+    _assert_matches(response.json, [r for r in rows if r['category'] in ('Food', 'Fun')])
+
+
+def test_trends_empty(client):
+    response = client.get('/api/analytics/trends')
+
+    assert response.status_code == 200
+    assert response.json == {'runningBalance': [], 'categoryTrends': {'income': {}, 'expense': {}}}
@@ -0,0 +1,62 @@
+import sys
+import threading
+
+from username_index import UsernameIndex
+
+from conftest import create_user
+from models import db, User
+
+
+def test_check_username_is_case_insensitive(app, client):
+    create_user(app, 'Alice2')
+
+    assert client.get('/api/check_username?username=alice2').json == {'available': False}
+    assert client.get('/api/check_username?username=bob').json == {'available': True}
+
+    response = client.post('/api/signup', json={'username': 'ALICE2', 'email': 'a2@example.com',
+                                                'password': 'password'})
+    assert response.status_code == 400
+
+
+def test_taken_names_stay_taken_while_the_filter_grows(app):
+    index = UsernameIndex(refresh_seconds=3600)
+    with app.app_context():
+        assert not index.is_taken('zz-anchor')
+    index.add('zz-anchor')  # sorts last: added last on a rebuild
+
+    misses = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            if not index.is_taken('zz-anchor'):
+                misses.append(1)
+
+    thread = threading.Thread(target=reader)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # let the reader in mid-rebuild
+    thread.start()
+    try:
+        # Several rebuilds: the filter starts at capacity 1000 and doubles
+        for i in range(8000):
+            index.add(f'user{i}')
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+
+    assert not misses
+    assert all(index.is_taken(f'USER{i}') for i in range(0, 8000, 97))
+
+
+def test_refresh_sees_lower_ids_that_commit_later(app):
+    index = UsernameIndex(refresh_seconds=0)
+    with app.app_context():
+        # A Postgres signup that got its id first but commits second
+        db.session.add(User(id=20, username='late-second', email='b@example.com', password_hash='x'))
+        db.session.commit()
+        assert index.is_taken('late-second')
+
+        db.session.add(User(id=10, username='late-first', email='a@example.com', password_hash='x'))
+        db.session.commit()
+        assert index.is_taken('late-first')
@@ -0,0 +1,314 @@
+import datetime
+import logging
+
+from flask import Blueprint, g, jsonify, request
+
+from archive import restore_archived
+from auth import login_required
+from events import queue_event
+from models import db, Transaction, Tombstone, bump_change_version, get_home_currency
+from money import from_minor, to_minor, to_base_minor
+from rate_limit import rate_limit
+from replicas import replica_read
+
+bp = Blueprint('transactions', __name__)
+
+
+@bp.route('/api/transactions', methods=['POST'])
+@login_required
+def add_transaction():
+    from dateutil.relativedelta import relativedelta
+
+    user_id = g.user_id
+    data = request.json
+    start_date = datetime.datetime.strptime(data.get('date'), '%Y-%m-%d')
+    recurrence_months = int(data.get('recurrence_months', 1)) if data.get('is_recurring') else 1
+
+    transaction_ids = []
+    home_currency = get_home_currency(user_id)
+    version = bump_change_version(user_id)
+
+    for i in range(recurrence_months):
+        transaction_date = start_date + relativedelta(months=i)
+        tx = Transaction(
+            type=data['type'],
+            category=data['category'],
+            description=data.get('description', ''),
+            date=transaction_date.date(),
+            user_id=user_id,
+            currency=data.get('currency', 'ILS'),
+            version=version
+        )
+        tx.set_amount(data['amount'], data.get('exchange_rate', 1.0), home_currency)
+        db.session.add(tx)
+        db.session.flush()
+        transaction_ids.append(tx.id)
+
+    queue_event(db.session, user_id, 'transaction', 'created', transaction_ids, version)
+    db.session.commit()
+
+    return jsonify({
+        'ids': transaction_ids,
+        'message': f'{recurrence_months} transaction(s) added successfully'
+    }), 201
+
+
+
+@bp.route('/api/transactions', methods=['GET'])
+@login_required
+@replica_read
+def get_transactions():
+    user_id = g.user_id
+    transactions = Transaction.query.filter_by(user_id=user_id).order_by(Transaction.date.desc(), Transaction.created_at.desc()).limit(100).all()
+    return jsonify([{
+        'id': tx.id,
+        'type': tx.type,
+        'category': tx.category,
+        'amount': tx.amount,
+        'currency': tx.currency or 'ILS',
+        'exchange_rate': tx.exchange_rate or 1.0,
+        'description': tx.description,
+        'date': tx.date.strftime('%Y-%m-%d'),
+        'created_at': tx.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    } for tx in transactions])
+
+
+def _hot_transaction(user_id, transaction_id):
+    tx = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+    if tx is None and restore_archived(user_id, [transaction_id]):
+        tx = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+    return tx
+
+
+@bp.route('/api/transactions/<int:transaction_id>', methods=['PUT'])
+@login_required
+def update_transaction(transaction_id):
+    user_id = g.user_id
+    data = request.json
+    tx = _hot_transaction(user_id, transaction_id)
+    if not tx:
+        return jsonify({'error': 'Transaction not found'}), 404
+
+    tx.type = data['type']
+    tx.category = data['category']
+    tx.description = data.get('description', '')
+    tx.date = datetime.datetime.strptime(data['date'], '%Y-%m-%d').date()
+    tx.user_id = user_id
+    tx.currency = data.get('currency', tx.currency or 'ILS')
+    tx.set_amount(
+        data['amount'],
+        data.get('exchange_rate', tx.exchange_rate or 1.0),
+        get_home_currency(user_id)
+    )
+    tx.version = bump_change_version(user_id)
+
+    queue_event(db.session, user_id, 'transaction', 'updated', [tx.id], tx.version)
+    db.session.commit()
+    return jsonify({'message': 'Transaction updated successfully'})
+
+@bp.route('/api/transactions/<int:transaction_id>', methods=['DELETE'])
+@login_required
+def delete_transaction(transaction_id):
+    user_id = g.user_id
+    tx = _hot_transaction(user_id, transaction_id)
+    if not tx:
+        return jsonify({'error': 'Transaction not found'}), 404
+    version = bump_change_version(user_id)
+    db.session.add(Tombstone(
+        user_id=user_id,
+        entity='transaction',
+        entity_id=tx.id,
+        version=version
+    ))
+    queue_event(db.session, user_id, 'transaction', 'deleted', [tx.id], version)
+    db.session.delete(tx)
+    db.session.commit()
+    return jsonify({'message': 'Transaction deleted successfully'})
+
+
+MAX_BATCH_OPERATIONS = 500
+
+
+def _required_string(op, field):
+    value = op.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f'{field} must be a non-empty string')
+    return value
+
+
+def _batch_update_values(op, current, home_currency):
+    """Column values for one 'update' op; raises ValueError on bad input."""
+    values = {}
+    for field in ('type', 'category'):
+        if field in op:
+            values[field] = _required_string(op, field)
+    if values.get('type', 'expense') not in ('income', 'expense'):
+        raise ValueError('type must be income or expense')
+    if 'description' in op:
+        if op['description'] is not None and not isinstance(op['description'], str):
+            raise ValueError('description must be a string')
+        values['description'] = op['description']
+    if 'date' in op:
+        values['date'] = datetime.datetime.strptime(op['date'], '%Y-%m-%d').date()
+
+    if {'currency', 'amount', 'exchange_rate'} & op.keys():
+        currency = _required_string(op, 'currency') if 'currency' in op else current.currency or 'ILS'
+        amount = op['amount'] if 'amount' in op else from_minor(current.amount_minor, current.currency)
+        exchange_rate = float(op.get('exchange_rate', current.exchange_rate or 1.0))
+        values.update(
+            currency=currency,
+            exchange_rate=exchange_rate,
+            amount_minor=to_minor(amount, currency),
+            amount_base=to_base_minor(amount, exchange_rate, home_currency),
+        )
+    if not values:
+        raise ValueError('No fields to update')
+    return values
+
+
+@bp.route('/api/transactions/batch', methods=['POST'])
+@login_required
+def batch_transactions():
+    """Apply many update/delete/recategorize operations in one DB transaction.
+
+    Body: {"operations": [{"op": "update", "id": 1, "amount": 12.5, ...},
+                          {"op": "delete", "id": 2},
+                          {"op": "recategorize", "id": 3, "category": "Food"}]}
+    Every operation gets an entry in "results", in request order; invalid
+    items are reported there and the rest are still applied. Ids from
+    archived years are restored to the hot table first. Subscribers get one
+    "batch" event with the "updated" and "deleted" ids.
+    """
+    user_id = g.user_id
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+
+    results = [None] * len(operations)
+    seen_ids = set()
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or op.get('op') not in ('update', 'delete', 'recategorize'):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Unknown operation'}
+        elif not isinstance(op.get('id'), int) or isinstance(op['id'], bool):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Missing transaction id'}
+        elif op['id'] in seen_ids:
+            results[index] = {'index': index, 'id': op['id'], 'status': 'error',
+                              'error': 'Transaction appears more than once in the batch'}
+        else:
+            seen_ids.add(op['id'])
+
+    # One SELECT for ownership and the current values partial updates build on
+    existing = {}
+    if seen_ids:
+        current = db.select(
+            Transaction.id,
+            Transaction.currency,
+            Transaction.exchange_rate,
+            Transaction.amount_minor
+        ).where(Transaction.user_id == user_id)
+        existing = {row.id: row for row in db.session.execute(current.where(Transaction.id.in_(seen_ids)))}
+        # Ids from archived years are moved back to the hot table first
+        restored = restore_archived(user_id, seen_ids - existing.keys())
+        if restored:
+            existing.update((row.id, row) for row in db.session.execute(current.where(Transaction.id.in_(restored))))
+
+    home_currency = get_home_currency(user_id)
+    deletes = []
+    recategorize = {}
+    updates = []
+    for index, op in enumerate(operations):
+        if results[index] is not None:
+            continue
+        tx_id = op['id']
+        if tx_id not in existing:
+            results[index] = {'index': index, 'id': tx_id, 'status': 'not_found'}
+            continue
+
+        if op['op'] == 'delete':
+            deletes.append(tx_id)
+            results[index] = {'index': index, 'id': tx_id, 'status': 'deleted'}
+        elif op['op'] == 'recategorize':
+            try:
+                category = _required_string(op, 'category')
+            except ValueError as e:
+                results[index] = {'index': index, 'id': tx_id, 'status': 'error', 'error': str(e)}
+                continue
+            recategorize.setdefault(category, []).append(tx_id)
+            results[index] = {'index': index, 'id': tx_id, 'status': 'updated'}
+        else:
+            try:
+                values = _batch_update_values(op, existing[tx_id], home_currency)
+            except (TypeError, ValueError, ArithmeticError) as e:
+                results[index] = {'index': index, 'id': tx_id, 'status': 'error', 'error': str(e)}
+                continue
+            updates.append(dict(values, id=tx_id))
+            results[index] = {'index': index, 'id': tx_id, 'status': 'updated'}
+
+    if not (deletes or recategorize or updates):
+        return jsonify({'version': None, 'results': results})
+
+    version = bump_change_version(user_id)
+    now = datetime.datetime.utcnow()
+    updated_ids = []
+
+    if updates:
+        # ORM bulk UPDATE by primary key: executemany, grouped by column set
+        db.session.execute(
+            db.update(Transaction),
+            [dict(values, version=version, updated_at=now) for values in updates]
+        )
+        updated_ids.extend(values['id'] for values in updates)
+    for category, ids in recategorize.items():
+        db.session.execute(
+            db.update(Transaction)
+            .where(Transaction.user_id == user_id, Transaction.id.in_(ids))
+            .values(category=category, version=version, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        updated_ids.extend(ids)
+    if deletes:
+        db.session.execute(
+            db.delete(Transaction)
+            .where(Transaction.user_id == user_id, Transaction.id.in_(deletes))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(db.insert(Tombstone), [{
+            'user_id': user_id,
+            'entity': 'transaction',
+            'entity_id': tx_id,
+            'version': version,
+            'deleted_at': now
+        } for tx_id in deletes])
+
+    # One event per version: event ids are versions, so a second event
+    # with the same id would be dropped by the stream and break resume
+    queue_event(db.session, user_id, 'transaction', 'batch', updated_ids + deletes, version,
+                updated=updated_ids, deleted=deletes)
+    db.session.commit()
+
+    return jsonify({'version': version, 'results': results})
+
+
+
+@bp.route('/api/exchange-rate', methods=['GET'])
+@login_required
+@rate_limit('exchange_rate', capacity=30, per_seconds=60, key='user')
+def get_exchange_rate():
+    import requests as req
+    from_currency = request.args.get('from', 'USD').upper()
+    to_currency = request.args.get('to', 'ILS').upper()
+    if from_currency == to_currency:
+        return jsonify({'rate': 1.0})
+    try:
+        r = req.get(f'https://open.er-api.com/v6/latest/{from_currency}', timeout=5)
+        data = r.json()
+        rate = data['rates'].get(to_currency)
+        if rate is None:
+            return jsonify({'error': 'Currency not found'}), 400
+        return jsonify({'rate': rate})
+    except Exception as e:
+        logging.error('Exchange rate fetch failed: %s', e)
+        return jsonify({'error': 'Failed to fetch exchange rate'}), 502
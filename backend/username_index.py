@@ -0,0 +1,130 @@
+"""Per-worker index of taken usernames for the signup typeahead.
+
+A Bloom filter answers "definitely free" for most keystrokes; a sorted
+list of lowercase names confirms the rest. Both are filled from the
+database on first use and topped up at most every
+USERNAME_INDEX_REFRESH_SECONDS, so names taken through other workers show up
+shortly. A top-up rereads the last USERNAME_INDEX_REFRESH_OVERLAP ids below
+the highest one seen, not just newer ones: Postgres hands out ids at insert
+time, so a signup can commit after one with a higher id. The
+case-insensitive unique index on ``user`` stays the source of truth for
+signup.
+"""
+import bisect
+import hashlib
+import math
+import os
+import threading
+import time
+
+from models import db, User
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1000)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class UsernameIndex:
+    def __init__(self, refresh_seconds=None, refresh_overlap=None):
+        if refresh_seconds is None:
+            refresh_seconds = float(os.environ.get('USERNAME_INDEX_REFRESH_SECONDS', 5))
+        if refresh_overlap is None:
+            refresh_overlap = int(os.environ.get('USERNAME_INDEX_REFRESH_OVERLAP', 1000))
+        self.refresh_seconds = refresh_seconds
+        self.refresh_overlap = refresh_overlap
+        self._lock = threading.Lock()
+        self._names = None
+        self._bloom = None
+        self._max_id = 0
+        self._refreshed_at = 0.0
+
+    @staticmethod
+    def _build_bloom(names):
+        bloom = BloomFilter(len(names) * 2)
+        for name in names:
+            bloom.add(name)
+        return bloom
+
+    def _add_locked(self, names):
+        # is_taken() reads without the lock, so nothing it can see is changed
+        # in place: build the new list (and filter, when it has to grow) and
+        # swap them in. The filter goes first; a name is visible once both are.
+        current = self._names
+        added = set()
+        for name in names:
+            i = bisect.bisect_left(current, name)
+            if i == len(current) or current[i] != name:
+                added.add(name)
+        if not added:
+            return
+        merged = list(current)
+        for name in added:
+            bisect.insort(merged, name)
+        if self._bloom.count + len(added) > self._bloom.capacity:
+            # Keep the false-positive rate in check as the user base grows
+            self._bloom = self._build_bloom(merged)
+        else:
+            for name in added:
+                self._bloom.add(name)  # only sets bits: safe to do in place
+        self._names = merged
+
+    def _load_locked(self):
+        rows = db.session.execute(
+            db.select(User.id, db.func.lower(User.username))
+            .where(User.id > self._max_id - self.refresh_overlap)
+        ).all()
+        if self._names is None:
+            names = sorted({name for _, name in rows})
+            self._bloom = self._build_bloom(names)
+            self._names = names
+        else:
+            self._add_locked(name for _, name in rows)
+        if rows:
+            self._max_id = max(self._max_id, max(user_id for user_id, _ in rows))
+        self._refreshed_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._names is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._names is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+                self._load_locked()
+
+    def is_taken(self, username):
+        self._ensure_fresh()
+        name = username.lower()
+        if name not in self._bloom:
+            return False
+        names = self._names
+        i = bisect.bisect_left(names, name)
+        return i < len(names) and names[i] == name
+
+    def add(self, username):
+        with self._lock:
+            if self._names is None:
+                return
+            self._add_locked([username.lower()])
+            # Do not advance _max_id: lower ids from other workers may still be unseen
+
+
+username_index = UsernameIndex()
@@ -34,6 +34,8 @@ export default function Analytics({ onEdit }) {
   const [viewMode, setViewMode] = useState('monthly');
   const [selectedMonth, setSelectedMonth] = useState(getCurrentYearMonth());
   const [rawAnalytics, setRawAnalytics] = useState(null);
+  // Rows of archived years, by year and month; /analytics only returns their totals
+  const [archivedDetails, setArchivedDetails] = useState({});
   const [categoryFilter, setCategoryFilter] = useState('all');
   const [loading, setLoading] = useState(false);
   const [categoryColors, setCategoryColors] = useState(() => {
@@ -114,6 +116,7 @@ const fetchAnalytics = async (includeAll = false) => {
       setRawAnalytics(null);
     } else {
       const data = await res.json();
+      setArchivedDetails({});
       setRawAnalytics(data);
     }
   } catch (e) {
@@ -124,6 +127,25 @@ const fetchAnalytics = async (includeAll = false) => {
   }
 };
 
+useEffect(() => {
+  const year = parseInt(selectedMonth.split('-')[0]);
+  if (!rawAnalytics?.archivedYears?.includes(year) || archivedDetails[year]) return;
+  const fetchArchivedYear = async () => {
+    const res = await authFetch(`${API_BASE_URL}/archive/${year}`);
+    if (!res.ok) {
+      console.error('Failed to load archived year:', res.statusText);
+      return;
+    }
+    const byMonth = {};
+    (await res.json()).forEach((tx) => {
+      const month = tx.date.slice(0, 7);
+      byMonth[month] = (byMonth[month] || []).concat(tx);
+    });
+    setArchivedDetails((prev) => ({ ...prev, [year]: byMonth }));
+  };
+  fetchArchivedYear();
+}, [selectedMonth, rawAnalytics]);
+
   const currentYear = new Date().getFullYear().toString();
 
   const computeYearlySummary = () => {
@@ -198,7 +220,8 @@ const fetchAnalytics = async (includeAll = false) => {
 
   const buildMonthlyExpenseList = () => {
     if (!rawAnalytics?.details) return [];
-    const arr = rawAnalytics.details[selectedMonth] || [];
+    const archived = archivedDetails[selectedMonth.slice(0, 4)]?.[selectedMonth] || [];
+    const arr = (rawAnalytics.details[selectedMonth] || []).concat(archived);
     return arr
       .filter(
         (tx) => (categoryFilter === 'all' || tx.category === categoryFilter)